@@ -1,17 +1,27 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Чтение данных с указанием разделителя и обработкой ошибок
-try:
-    data = pd.read_csv('how.csv', sep=';', encoding='utf-8', header=0)
-except UnicodeDecodeError:
-    data = pd.read_csv('how.csv', sep=';', encoding='latin1', header=0)
+# Общие модули анализа лежат в pokupki/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pokupki'))
+import grafiki
+from zamery import logger, setup_logging, stage
+from chtenie import detect_format
+from nagrady import stream_reward_totals, top_k
 
-# Вывод информации о данных
-print("Доступные колонки в файле:", data.columns.tolist())
-print("\nПервые 5 строк данных:")
-print(data.head())
+setup_logging()
+
+# Кодировка и разделитель определяются по началу файла; для просмотра читаются первые строки
+with stage('load', path='how.csv', preview=True) as record:
+    encoding, sep = detect_format('how.csv')
+    data = pd.read_csv('how.csv', sep=sep, encoding=encoding, header=0, nrows=5)
+    record['rows'] = len(data)
+
+# Вывод информации о данных (уровень DEBUG)
+logger.debug("Доступные колонки в файле: %s", data.columns.tolist())
+logger.debug("Первые 5 строк данных:\n%s", data.head())
 
 # Определение правильных названий колонок
 mission_column = 'Название миссии'
@@ -24,48 +34,51 @@ if mission_column not in data.columns or reward_column not in data.columns:
     print("2. Колонка с вознаграждением:", reward_column)
     raise ValueError("Необходимо указать правильные названия колонок")
 
-# Преобразование колонки с вознаграждением в числовой формат
-data[reward_column] = pd.to_numeric(data[reward_column], errors='coerce')
-
-# Группировка данных по названию миссии и суммирование вознаграждений
-mission_rewards = data.groupby(mission_column)[reward_column].sum().reset_index()
-
-# Сортировка данных по сумме вознаграждений и выбор топ-10
-mission_rewards = mission_rewards.sort_values(reward_column, ascending=False).head(10)
-
-# Настройка стиля графика
-plt.figure(figsize=(15, 8))
-sns.set_style("whitegrid")
-
-# Создание горизонтальной столбчатой диаграммы
-ax = sns.barplot(x=reward_column, y=mission_column, data=mission_rewards, orient='h', color='lightgreen')
-
-# Настройка заголовка и меток
-plt.title('Топ-10 миссий по сумме вознаграждений', fontsize=16, pad=20)
-plt.xlabel('Общая сумма вознаграждений', fontsize=12)
-plt.ylabel('Название миссии', fontsize=12)
-
-# Поворот подписей по оси X для лучшей читаемости
-plt.xticks(rotation=45, ha='right')
-
-# Добавление значений на столбцы
-for p in ax.patches:
-    width = p.get_width()
-    ax.annotate(f'{width:,.0f}'.replace(',', ' '),
-                (width, p.get_y() + p.get_height()/2),
-                ha='left', va='center',
-                xytext=(5, 0),
-                textcoords='offset points',
-                fontsize=10, color='black')
-
-# Автоматическая настройка макета
-plt.tight_layout()
-
-# Сохранение графика
-plt.savefig('top_10_mission_rewards.png', dpi=300, bbox_inches='tight')
+# Потоковый подсчет суммы, среднего и количества вознаграждений по миссиям
+# (битые строки уходят в how.rejected.csv; замер этапа 'aggregate' пишет stream_reward_totals)
+mission_totals = stream_reward_totals('how.csv', mission_column, reward_column)
+
+# Выбор топ-10 по сумме вознаграждений без сортировки всех миссий
+with stage('filter', rows=len(mission_totals)) as record:
+    mission_rewards = top_k(mission_totals, 10, by='sum').rename(columns={'sum': reward_column}).reset_index()
+    record['selected'] = len(mission_rewards)
+
+# Построение графика (сохранение и показ замеряет grafiki.show_figure)
+with stage('render', figure='dannie_top_10_mission_rewards', step='build'):
+    # Настройка стиля графика
+    plt.figure(figsize=(15, 8))
+    sns.set_style("whitegrid")
+
+    # Создание горизонтальной столбчатой диаграммы
+    ax = sns.barplot(x=reward_column, y=mission_column, data=mission_rewards, orient='h', color='lightgreen')
+
+    # Настройка заголовка и меток
+    plt.title('Топ-10 миссий по сумме вознаграждений', fontsize=16, pad=20)
+    plt.xlabel('Общая сумма вознаграждений', fontsize=12)
+    plt.ylabel('Название миссии', fontsize=12)
+
+    # Поворот подписей по оси X для лучшей читаемости
+    plt.xticks(rotation=45, ha='right')
+
+    # Добавление значений на столбцы
+    for p in ax.patches:
+        width = p.get_width()
+        ax.annotate(f'{width:,.0f}'.replace(',', ' '),
+                    (width, p.get_y() + p.get_height()/2),
+                    ha='left', va='center',
+                    xytext=(5, 0),
+                    textcoords='offset points',
+                    fontsize=10, color='black')
+
+    # Автоматическая настройка макета
+    plt.tight_layout()
+
+# Сохранение графика (в пакетном режиме график сохраняется в каталог grafiki.OUTPUT_DIR)
+if grafiki.OUTPUT_DIR is None:
+    plt.savefig('top_10_mission_rewards.png', dpi=300, bbox_inches='tight')
 
 # Показать график
-plt.show()
+grafiki.show_figure('dannie_top_10_mission_rewards')
 
 # Вывод топ-10 миссий в консоль
 print("\nТоп-10 миссий по сумме вознаграждений:")
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from zamery import stage
+
+
+def employee_row_keys(employee_codes, purchase_codes):
+    """Сопоставляет каждой покупке номер строки сотрудника в таблице сотрудников (-1, если не найден)"""
+    if (isinstance(employee_codes.dtype, pd.CategoricalDtype)
+            and employee_codes.dtype == purchase_codes.dtype):
+        # Общий словарь кодов (encode_tables): соединение через таблицу перекодировки int -> int
+        employee_cat_codes = employee_codes.cat.codes.to_numpy()
+        known = employee_cat_codes >= 0
+        position = np.full(len(employee_codes.cat.categories) + 1, -1, dtype=np.int64)
+        position[employee_cat_codes[known]] = np.flatnonzero(known)
+        # Код -1 (пропуск) попадает в последний элемент, где всегда -1
+        return position[purchase_codes.cat.codes.to_numpy()]
+    return pd.Index(employee_codes).get_indexer(purchase_codes)
+
+
+def aggregate_purchases(employee_data, purchase_data, group_column='Эффективность'):
+    """
+    Считает все агрегаты по покупкам за один проход вместо отдельного isin() на каждую группу.
+    Покупки один раз сопоставляются с таблицей сотрудников по целочисленному ключу
+    (номер строки сотрудника в employee_data), дальше все счетчики получаются через np.bincount.
+
+    Возвращает словарь:
+      'employee_counts' - число покупок каждого сотрудника, с нулями (индекс - код сотрудника)
+      'employee_groups' - группа каждого сотрудника (индекс - код сотрудника)
+      'group_sizes'     - число сотрудников в каждой группе
+      'group_purchases' - число покупок в каждой группе
+      'category_counts' - DataFrame: категории x группы, число покупок
+    """
+    with stage('aggregate', rows=len(purchase_data)):
+        return _aggregate_purchases(employee_data, purchase_data, group_column)
+
+
+def _aggregate_purchases(employee_data, purchase_data, group_column):
+    """Расчет для aggregate_purchases"""
+    employee_codes = pd.Index(employee_data['Код сотрудника'])
+    group_key, groups = pd.factorize(employee_data[group_column], sort=True)
+    n_employees = len(employee_codes)
+    n_groups = len(groups)
+
+    # Целочисленный ключ сотрудника для каждой покупки; -1 - сотрудника нет в таблице
+    employee_key = employee_row_keys(employee_data['Код сотрудника'], purchase_data['Код сотрудника'])
+    matched = employee_key >= 0
+    employee_key = employee_key[matched]
+
+    purchase_categories = purchase_data['Категория']
+    if isinstance(purchase_categories.dtype, pd.CategoricalDtype):
+        # cat.codes - int8 при числе категорий до 128: ключ category_key * n_groups переполнился бы
+        category_key = purchase_categories.cat.codes.to_numpy().astype(np.int64)[matched]
+        categories = purchase_categories.cat.categories
+    else:
+        category_key, categories = pd.factorize(purchase_categories.to_numpy()[matched])
+
+    # Группа каждой покупки; -1 - у сотрудника не указано значение group_column
+    purchase_group = group_key[employee_key]
+    in_group = purchase_group >= 0
+    with_category = in_group & (category_key >= 0)
+
+    employee_counts = np.bincount(employee_key, minlength=n_employees)
+    group_sizes = np.bincount(group_key[group_key >= 0], minlength=n_groups)
+    group_purchases = np.bincount(purchase_group[in_group], minlength=n_groups)
+    category_group = np.bincount(
+        category_key[with_category] * n_groups + purchase_group[with_category],
+        minlength=len(categories) * n_groups
+    ).reshape(len(categories), n_groups)
+
+    category_counts = pd.DataFrame(category_group, index=pd.Index(categories, name='Категория'), columns=groups)
+    # Категории, которые покупали только сотрудники без группы, в результат не попадают
+    category_counts = category_counts[category_counts.sum(axis=1) > 0]
+
+    return {
+        'employee_counts': pd.Series(employee_counts, index=employee_codes),
+        'employee_groups': pd.Series(employee_data[group_column].to_numpy(), index=employee_codes),
+        'group_sizes': pd.Series(group_sizes, index=groups),
+        'group_purchases': pd.Series(group_purchases, index=groups),
+        'category_counts': category_counts,
+    }
+
+
+def group_employee_counts(aggregates, group):
+    """Возвращает массив покупок на сотрудника для одной группы, включая сотрудников без покупок"""
+    in_group = (aggregates['employee_groups'] == group).to_numpy()
+    return aggregates['employee_counts'].to_numpy()[in_group]
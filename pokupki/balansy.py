@@ -0,0 +1,176 @@
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from zagruzka import CACHE_DIR_NAME, HAS_PYARROW
+
+if HAS_PYARROW:
+    import pyarrow as pa
+    from pyarrow import feather
+
+# Строковые столбцы, которые в снимке хранятся словарем (целые коды + список значений)
+DICTIONARY_COLUMNS = ['Департамент']
+
+# Разделитель названий контейнеров в поле 'Контейнер'
+CONTAINER_SEPARATOR = ','
+
+
+def _snapshot_paths(balance_path):
+    """
+    Пути к снимкам ef.csv в каталоге кэша: основная таблица и таблица
+    'сотрудник - контейнер'. Ключом служат размер и mtime исходного файла.
+    """
+    stat = os.stat(balance_path)
+    directory, name = os.path.split(os.path.abspath(balance_path))
+    base = f'{os.path.splitext(name)[0]}-{stat.st_size}-{stat.st_mtime_ns}'
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f'{base}.arrow'), os.path.join(cache_dir, f'{base}.containers.arrow')
+
+
+def explode_containers(containers):
+    """
+    Раскладывает упакованное через запятую поле 'Контейнер' в нормализованную таблицу:
+    'Номер строки' (строка исходной таблицы) и 'Контейнер' (Categorical, целые коды).
+    """
+    exploded = containers.str.split(CONTAINER_SEPARATOR).explode().str.strip()
+    exploded = exploded[exploded.notna() & (exploded != '')]
+    return pd.DataFrame({
+        'Номер строки': exploded.index.to_numpy(dtype=np.int32),
+        'Контейнер': pd.Categorical(exploded.to_numpy()),
+    })
+
+
+def _write_snapshot(table, path):
+    """Пишет несжатый Feather (Arrow IPC) через временный файл, чтобы его можно было отображать в память"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_balance_snapshot(balance_path):
+    """
+    Один раз разбирает ef.csv и сохраняет два снимка Arrow: таблицу балансов
+    (департамент - словарем) и таблицу 'сотрудник - контейнер' с целыми кодами контейнеров.
+    Возвращает пути к снимкам.
+    """
+    snapshot_path, containers_path = _snapshot_paths(balance_path)
+    balances = pd.read_csv(balance_path).reset_index(drop=True)
+    for column in DICTIONARY_COLUMNS:
+        balances[column] = balances[column].astype('category')
+
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    _write_snapshot(pa.Table.from_pandas(balances, preserve_index=False), snapshot_path)
+    _write_snapshot(pa.Table.from_pandas(explode_containers(balances['Контейнер']), preserve_index=False),
+                    containers_path)
+
+    # Снимки старых версий файла больше не нужны. Имя проверяется целиком
+    # ({prefix}-{размер}-{mtime}[.containers].arrow), чтобы не задеть снимки других
+    # файлов с тем же началом имени (например, ef-2024.csv рядом с ef.csv)
+    prefix = os.path.basename(snapshot_path).rsplit('-', 2)[0]
+    pattern = os.path.join(glob.escape(os.path.dirname(snapshot_path)), f'{glob.escape(prefix)}-*-*.arrow')
+    stale_name = re.compile(rf'{re.escape(prefix)}-\d+-\d+(\.containers)?\.arrow')
+    for stale in glob.glob(pattern):
+        if stale not in (snapshot_path, containers_path) and stale_name.fullmatch(os.path.basename(stale)):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    return snapshot_path, containers_path
+
+
+def _read_snapshot(path, columns=None):
+    """Читает из отображенного в память снимка только нужные столбцы"""
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def load_balances(balance_path, columns=None):
+    """
+    Загружает столбцы columns из ef.csv через снимок Arrow (при первом обращении
+    или после изменения файла снимок строится заново). Читаются только запрошенные
+    столбцы, 'Департамент' приходит как Categorical.
+    Без pyarrow читает CSV напрямую.
+    """
+    if not HAS_PYARROW:
+        return pd.read_csv(balance_path, usecols=columns)
+
+    snapshot_path, _ = _snapshot_paths(balance_path)
+    if not os.path.exists(snapshot_path):
+        try:
+            snapshot_path, _ = build_balance_snapshot(balance_path)
+        except OSError:
+            # Каталог может быть недоступен для записи: работаем без снимка
+            return pd.read_csv(balance_path, usecols=columns)
+    return _read_snapshot(snapshot_path, columns)
+
+
+def load_container_table(balance_path):
+    """
+    Возвращает таблицу 'сотрудник - контейнер': 'Номер строки' в ef.csv
+    и 'Контейнер' (Categorical). Одна строка ef.csv дает столько строк, сколько у нее контейнеров.
+    """
+    if not HAS_PYARROW:
+        return explode_containers(pd.read_csv(balance_path, usecols=['Контейнер'])['Контейнер'])
+
+    snapshot_path, containers_path = _snapshot_paths(balance_path)
+    if not os.path.exists(containers_path):
+        try:
+            _, containers_path = build_balance_snapshot(balance_path)
+        except OSError:
+            return explode_containers(pd.read_csv(balance_path, usecols=['Контейнер'])['Контейнер'])
+    return _read_snapshot(containers_path)
+
+
+def _rollup(keys, labels, balance, name):
+    """Число строк, сумма и средний баланс по целым кодам keys"""
+    n = len(labels)
+    count = np.bincount(keys, minlength=n)
+    total = np.bincount(keys, weights=balance, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    rollup = pd.DataFrame({'Сотрудников': count, 'Сумма баланса': total, 'Средний баланс': mean},
+                          index=pd.Index(labels, name=name))
+    return rollup[count > 0].sort_values('Сумма баланса', ascending=False)
+
+
+def balance_by_department(balance_path):
+    """Баланс по департаментам; читаются только 'Департамент' (коды) и 'Баланс'"""
+    balances = load_balances(balance_path, ['Департамент', 'Баланс'])
+    department = balances['Департамент'].astype('category')
+    known = department.cat.codes.to_numpy() >= 0
+    return _rollup(department.cat.codes.to_numpy()[known], department.cat.categories,
+                   balances['Баланс'].to_numpy()[known], 'Департамент')
+
+
+def balance_by_container(balance_path):
+    """
+    Баланс по контейнерам: баланс сотрудника учитывается в каждом его контейнере.
+    Читаются только 'Баланс' и таблица 'сотрудник - контейнер'.
+    """
+    balance = load_balances(balance_path, ['Баланс'])['Баланс'].to_numpy()
+    containers = load_container_table(balance_path)
+    container = containers['Контейнер'].astype('category')
+    rows = containers['Номер строки'].to_numpy()
+    return _rollup(container.cat.codes.to_numpy(), container.cat.categories, balance[rows], 'Контейнер')
+
+
+if __name__ == "__main__":
+    # Путь к файлу балансов
+    balance_path = 'ef.csv'
+
+    try:
+        print("Баланс по департаментам:")
+        print(balance_by_department(balance_path))
+        print("\nБаланс по контейнерам:")
+        print(balance_by_container(balance_path))
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
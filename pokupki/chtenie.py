@@ -0,0 +1,205 @@
+import csv
+import os
+
+import pandas as pd
+from zamery import logger
+
+# Многопоточный разбор требует pyarrow; без него читаем через pandas, как раньше
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Размер начала файла, по которому определяются кодировка и разделитель
+SAMPLE_BYTES = 1024 * 1024
+
+# Кодировки проверяются по порядку; latin1 декодирует любые байты и стоит последней
+CANDIDATE_ENCODINGS = ('utf-8-sig', 'cp1251', 'latin1')
+CANDIDATE_DELIMITERS = ';,\t|'
+
+# Размер блока потокового чтения (байт)
+STREAM_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Наименьший блок потокового чтения: строка длиннее блока не разбирается pyarrow
+MIN_BLOCK_BYTES = 64 * 1024
+
+# Суффикс файла с отклоненными строками (рядом с исходным файлом)
+QUARANTINE_SUFFIX = '.rejected.csv'
+
+# Строки, которые pd.read_csv по умолчанию считает пропусками; pyarrow читает их так же
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def detect_format(path, sample_bytes=SAMPLE_BYTES):
+    """
+    Определяет кодировку и разделитель по началу файла (один раз, без повторного чтения файла).
+    Образец обрезается по последнему переводу строки, чтобы не резать многобайтный символ.
+    Возвращает (кодировка, разделитель).
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    if len(sample) == sample_bytes and b'\n' in sample:
+        sample = sample[:sample.rfind(b'\n') + 1]
+
+    for encoding in CANDIDATE_ENCODINGS:
+        try:
+            text = sample.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=CANDIDATE_DELIMITERS).delimiter
+    except csv.Error:
+        # Sniffer не справился (например, одна строка): самый частый разделитель в заголовке
+        header = text.split('\n', 1)[0]
+        delimiter = max(CANDIDATE_DELIMITERS, key=header.count)
+    return encoding, delimiter
+
+
+def quarantine_path_for(path):
+    """Путь к файлу отклоненных строк: p.csv -> p.rejected.csv"""
+    return f'{os.path.splitext(path)[0]}{QUARANTINE_SUFFIX}'
+
+
+def _locate_lines(path, encoding, texts):
+    """
+    Номера строк файла (с 1, заголовок - строка 1) для отклоненных строк.
+    При многопоточном разборе pyarrow номеров не сообщает, поэтому они ищутся
+    отдельным проходом - только если отклоненные строки есть.
+    """
+    wanted = set(texts)
+    numbers = {}
+    with open(path, encoding=encoding, newline='') as f:
+        for number, line in enumerate(f, start=1):
+            line = line.rstrip('\r\n')
+            if line in wanted:
+                numbers.setdefault(line, []).append(number)
+    return [numbers[text].pop(0) if numbers.get(text) else None for text in texts]
+
+
+def write_quarantine(path, rejected, encoding):
+    """
+    Сохраняет отклоненные строки в файл рядом с исходным, с номерами строк.
+    Если отклоненных строк нет, старый файл удаляется, чтобы не вводить в заблуждение.
+    """
+    quarantine_path = quarantine_path_for(path)
+    if not rejected:
+        if os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+        return None
+
+    quarantine = pd.DataFrame(rejected, columns=['Ожидалось столбцов', 'Найдено столбцов', 'Строка'])
+    quarantine.insert(0, 'Номер строки', _locate_lines(path, encoding, quarantine['Строка'].tolist()))
+    quarantine.to_csv(quarantine_path, sep=';', index=False, encoding='utf-8-sig')
+    return quarantine_path
+
+
+def _pandas_like_types(table):
+    """
+    Приводит типы, которые pyarrow выводит иначе, чем pd.read_csv: даты остаются
+    строками, а полностью пустые столбцы становятся float (NaN).
+    """
+    fields = []
+    for field in table.schema:
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.float64())
+        fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+def read_csv_quarantined(path, sep=None, encoding=None, usecols=None, use_threads=True):
+    """
+    Читает CSV многопоточным разборщиком pyarrow. Кодировка и разделитель, если не заданы,
+    определяются по началу файла. Строки с неверным числом полей не пропускаются молча,
+    а записываются в файл отклоненных строк (quarantine_path_for) с номерами строк;
+    их число сохраняется в data.attrs['Отклонено строк'] и выводится в журнал (WARNING).
+    Без pyarrow читает через pandas, битые строки пропускаются, как раньше.
+    """
+    if sep is None or encoding is None:
+        detected_encoding, detected_sep = detect_format(path)
+        encoding = encoding or detected_encoding
+        sep = sep or detected_sep
+
+    if not HAS_PYARROW:
+        return pd.read_csv(path, sep=sep, encoding=encoding, usecols=usecols, on_bad_lines='skip')
+
+    rejected = []
+
+    def quarantine_row(row):
+        rejected.append((row.expected_columns, row.actual_columns, row.text))
+        return 'skip'
+
+    # pyarrow сам пропускает BOM в UTF-8
+    arrow_encoding = 'utf8' if encoding.replace('-', '').lower() in ('utf8', 'utf8sig') else encoding
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(encoding=arrow_encoding, use_threads=use_threads),
+        parse_options=pa_csv.ParseOptions(delimiter=sep, invalid_row_handler=quarantine_row),
+        convert_options=pa_csv.ConvertOptions(include_columns=list(usecols) if usecols else None,
+                                              strings_can_be_null=True, null_values=NA_VALUES),
+    )
+    data = _pandas_like_types(table).to_pandas()
+
+    quarantine_path = write_quarantine(path, rejected, encoding)
+    data.attrs['Отклонено строк'] = len(rejected)
+    if rejected:
+        logger.warning("Отклонено строк: %d (см. %s)", len(rejected), quarantine_path)
+    return data
+
+
+def block_size_for_rows(path, rows, sample_bytes=SAMPLE_BYTES):
+    """Размер блока (байт), в который помещается примерно rows строк, по средней длине строки в начале файла"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    row_bytes = len(sample) / max(sample.count(b'\n'), 1)
+    return max(int(rows * row_bytes), MIN_BLOCK_BYTES)
+
+
+def iter_csv_quarantined(path, usecols, sep=None, encoding=None, block_size=STREAM_BLOCK_BYTES, record=None):
+    """
+    Читает столбцы usecols потоково, блоками примерно по block_size байт, все значения - строками
+    (типы приводит вызывающий код, так что блоки не расходятся в выводе типов).
+    Отклоненные строки записываются в файл отклоненных строк после чтения всего файла,
+    их число выводится в журнал и записывается в record['rejected'] (замер этапа zamery.stage).
+    Без pyarrow читает через pandas порциями, битые строки пропускаются.
+    """
+    if sep is None or encoding is None:
+        detected_encoding, detected_sep = detect_format(path)
+        encoding = encoding or detected_encoding
+        sep = sep or detected_sep
+    usecols = list(usecols)
+
+    if not HAS_PYARROW:
+        yield from pd.read_csv(path, sep=sep, encoding=encoding, usecols=usecols, dtype=str,
+                               on_bad_lines='skip', chunksize=max(block_size // 100, 1))
+        return
+
+    rejected = []
+
+    def quarantine_row(row):
+        rejected.append((row.expected_columns, row.actual_columns, row.text))
+        return 'skip'
+
+    arrow_encoding = 'utf8' if encoding.replace('-', '').lower() in ('utf8', 'utf8sig') else encoding
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(encoding=arrow_encoding, block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter=sep, invalid_row_handler=quarantine_row),
+        convert_options=pa_csv.ConvertOptions(include_columns=usecols, strings_can_be_null=True,
+                                              null_values=NA_VALUES,
+                                              column_types={column: pa.string() for column in usecols}),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+    quarantine_path = write_quarantine(path, rejected, encoding)
+    if record is not None:
+        record['rejected'] = len(rejected)
+    if rejected:
+        logger.warning("Отклонено строк: %d (см. %s)", len(rejected), quarantine_path)
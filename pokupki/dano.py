@@ -1,33 +1,101 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from grafiki import show_figure
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from zamery import logger, setup_logging, stage
+from potok import stream_purchase_counts
 
-def analyze_purchases(employee_data_path, purchase_data_path):
+# Квантиль продуктивности, начиная с которого сотрудник считается высокопродуктивным
+PRODUCTIVITY_QUANTILE = 0.65
 
+# Квантили для анализа чувствительности к порогу (0.05, 0.10, ..., 0.95)
+SWEEP_QUANTILES = np.round(np.arange(0.05, 0.96, 0.05), 2)
+
+def analyze_purchases(employee_data_path, purchase_data_path, chunksize=None, quantile=PRODUCTIVITY_QUANTILE):
+    # При заданном chunksize файл покупок читается порциями и целиком в память не загружается
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
-        print(purchase_data.columns)
+        employee_data = load_employee_data(employee_data_path)
+        if chunksize is None:
+            purchase_data = load_purchase_data(purchase_data_path)
+            logger.debug("Столбцы покупок: %s", list(purchase_data.columns))
+            # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+            employee_data, purchase_data = encode_tables(employee_data, purchase_data)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
 
-    productivity_threshold = employee_data['Продуктивность сотрудника'].quantile(0.65)  
+    productivity_threshold = employee_data['Продуктивность сотрудника'].quantile(quantile)
     high_productivity_employees = employee_data[employee_data['Продуктивность сотрудника'] >= productivity_threshold]['Код сотрудника']
 
-    print("High productivity employees:", high_productivity_employees)
-    print("Purchase data head:", purchase_data.head())
+    if chunksize is not None:
+        try:
+            category_distribution_df, _ = stream_purchase_counts(purchase_data_path, high_productivity_employees, chunksize)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
+        return category_distribution_df
+
+    logger.debug("High productivity employees: %d", len(high_productivity_employees))
+    logger.debug("Purchase data head:\n%s", purchase_data.head())
 
-    high_productivity_purchases = purchase_data['Код сотрудника'].isin(high_productivity_employees)
+    with stage('filter', rows=len(purchase_data)) as record:
+        high_productivity_purchases = purchase_data['Код сотрудника'].isin(high_productivity_employees)
+        record['selected'] = int(high_productivity_purchases.sum())
 
-    print("Is high_productivity_purchases empty?", high_productivity_purchases.empty)
+    logger.debug("Is high_productivity_purchases empty? %s", high_productivity_purchases.empty)
 
     category_distribution = purchase_data[high_productivity_purchases]['Категория'].value_counts()
+    # value_counts по Categorical возвращает и категории без покупок
+    category_distribution = category_distribution[category_distribution > 0]
 
     category_distribution_df = pd.DataFrame({'Категория': category_distribution.index, 'count': category_distribution.values})
 
     return category_distribution_df
 
+def category_threshold_sweep(employee_data, matrix, categories, quantiles=SWEEP_QUANTILES):
+    """
+    Распределение покупок по категориям для всех порогов продуктивности сразу.
+    Сотрудники сортируются по продуктивности один раз; для каждого порога сотрудники с
+    продуктивностью не ниже порога - это хвост отсортированного массива, и их покупки
+    берутся из накопленных сумм строк матрицы покупок (matrica), а не пересчитываются.
+    matrix - матрица сотрудники x категории в порядке строк employee_data.
+    Возвращает DataFrame: строки - квантиль и порог, столбцы - категории.
+    """
+    productivity = employee_data['Продуктивность сотрудника']
+    thresholds = productivity.quantile(quantiles).to_numpy()
+
+    # Сотрудники без продуктивности не проходят ни один порог (как при сравнении >= с NaN)
+    values = productivity.to_numpy(dtype=float)
+    rows = np.flatnonzero(~np.isnan(values))
+    order = rows[np.argsort(values[rows], kind='stable')]
+    sorted_values = values[order]
+
+    # cumulative[i] - покупки первых i сотрудников в порядке возрастания продуктивности
+    counts = matrix[order].toarray()
+    cumulative = np.zeros((len(order) + 1, counts.shape[1]), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+    first = np.searchsorted(sorted_values, thresholds, side='left')
+    distribution = cumulative[-1] - cumulative[first]
+
+    index = pd.MultiIndex.from_arrays([np.asarray(quantiles), thresholds], names=['Квантиль', 'Порог продуктивности'])
+    return pd.DataFrame(distribution, index=index, columns=categories)
+
+def sweep_purchases(employee_data_path, purchase_data_path, quantiles=SWEEP_QUANTILES):
+    """Анализ чувствительности для файлов: распределение категорий при каждом квантиле порога"""
+    # Матрица покупок сохраняется в кэше и при повторных запусках не пересчитывается
+    from matrica import cached_purchase_matrix
+
+    try:
+        employee_data = load_employee_data(employee_data_path)
+        matrix, _, categories = cached_purchase_matrix(employee_data_path, purchase_data_path)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
+
+    with stage('sweep', rows=matrix.shape[0]):
+        return category_threshold_sweep(employee_data, matrix, categories, quantiles)
+
 def plot_category_distribution(category_distribution_df, title="Распределение категорий покупок среди высокопродуктивных сотрудников"):
-    
+    # pyplot импортируется только при построении графика
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 6))
     plt.bar(category_distribution_df['Категория'], category_distribution_df['count'], color='#90EE90')
     plt.xlabel("Категория")
@@ -35,10 +103,11 @@ def plot_category_distribution(category_distribution_df, title="Распреде
     plt.title(title)
     plt.xticks(rotation=45, ha="right")
     plt.tight_layout()
-    plt.show()
+    show_figure('dano_category_distribution')
 
 
 if __name__ == "__main__":
+    setup_logging()
 
     employee_data_path = 'pokupki/tps.csv'  # Замените на актуальный путь
     purchase_data_path = 'pokupki/p.csv'  # Замените на актуальный путь
@@ -1,12 +1,17 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from grafiki import show_figure
+from korrelyacii import correlation_matrix, plot_correlation_heatmap
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from zamery import logger, setup_logging, stage
 
 def analyze_purchases(employee_data_path, purchase_data_path):
 
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
-        print(purchase_data.columns)
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
+        logger.debug("Столбцы покупок: %s", list(purchase_data.columns))
+        # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+        employee_data, purchase_data = encode_tables(employee_data, purchase_data)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
 
@@ -14,21 +19,27 @@ def analyze_purchases(employee_data_path, purchase_data_path):
     # Фильтруем только эффективных сотрудников
     effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
 
-    print("Effective employees:", effective_employees)
-    print("Purchase data head:", purchase_data.head())
+    logger.debug("Effective employees: %d", len(effective_employees))
+    logger.debug("Purchase data head:\n%s", purchase_data.head())
 
-    high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+    with stage('filter', rows=len(purchase_data)) as record:
+        high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+        record['selected'] = int(high_productivity_purchases.sum())
 
-    print("Is high_productivity_purchases empty?", high_productivity_purchases.empty)
+    logger.debug("Is high_productivity_purchases empty? %s", high_productivity_purchases.empty)
 
     category_distribution = purchase_data[high_productivity_purchases]['Категория'].value_counts()
+    # value_counts по Categorical возвращает и категории без покупок
+    category_distribution = category_distribution[category_distribution > 0]
 
     category_distribution_df = pd.DataFrame({'Категория': category_distribution.index, 'count': category_distribution.values})
 
     return category_distribution_df, purchase_data
 
 def plot_category_distribution(category_distribution_df, title="Распределение категорий покупок среди эффективных сотрудников"):
-    
+    # pyplot импортируется только при построении графика
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 6))
     plt.bar(category_distribution_df['Категория'], category_distribution_df['count'], color='#90EE90')
     plt.xlabel("Категория")
@@ -36,35 +47,21 @@ def plot_category_distribution(category_distribution_df, title="Распреде
     plt.title(title)
     plt.xticks(rotation=45, ha="right")
     plt.tight_layout()
-    plt.show()
+    show_figure('danowithmatrix_category_distribution')
 
-def plot_correlation_matrix(df):
+def plot_correlation_matrix(df, method='pearson'):
     """
     Строит матрицу корреляций для числовых столбцов DataFrame.
     """
-    numeric_df = df.select_dtypes(include=['number'])
-    corr_matrix = numeric_df.corr()
+    corr_matrix, p_values, _ = correlation_matrix(df, method)
 
     print(corr_matrix)
 
-    plt.figure(figsize=(10, 8))
-    plt.matshow(corr_matrix, fignum=1, cmap='coolwarm')
-    plt.xticks(range(len(corr_matrix.columns)), corr_matrix.columns, rotation=90)
-    plt.yticks(range(len(corr_matrix.columns)), corr_matrix.columns)
-    plt.gca().xaxis.tick_bottom()
-    plt.colorbar()
-    plt.title('Матрица корреляций', fontsize=16)
-
-    # Добавление значений на блоки
-    for i in range(len(corr_matrix.columns)):
-        for j in range(len(corr_matrix.columns)):
-            plt.text(j, i, f'{corr_matrix.iloc[i, j]:.2f}',
-                     ha="center", va="center", color="black")
-
-    plt.tight_layout()
-    plt.show()
+    plot_correlation_heatmap(corr_matrix)
+    return corr_matrix, p_values
 
 if __name__ == "__main__":
+    setup_logging()
 
     employee_data_path = 'pokupki/tps.csv'  # Замените на актуальный путь
     purchase_data_path = 'pokupki/p.csv'  # Замените на актуальный путь
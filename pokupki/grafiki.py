@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from zamery import stage
+
+# Профили сохранения: 'report' - итоговые графики для отчета, 'preview' - быстрые черновики
+RENDER_PROFILES = {
+    'report': {'dpi': 300, 'format': 'png'},
+    'preview': {'dpi': 72, 'format': 'png'},
+}
+
+# Каталог для сохранения графиков; None - показывать графики в окне (plt.show)
+# Для запусков по расписанию задается переменной окружения POKUPKI_PLOT_DIR
+OUTPUT_DIR = os.environ.get('POKUPKI_PLOT_DIR')
+PROFILE = os.environ.get('POKUPKI_PLOT_PROFILE', 'report')
+
+
+def configure_rendering(output_dir=None, profile='report'):
+    """
+    Включает пакетный режим: графики не показываются, а сохраняются в output_dir
+    через backend Agg, которому не нужен дисплей. output_dir=None возвращает plt.show().
+    """
+    global OUTPUT_DIR, PROFILE
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"Неизвестный профиль графиков: {profile}")
+    OUTPUT_DIR = output_dir
+    PROFILE = profile
+    if output_dir is not None:
+        # matplotlib импортируется только при включении пакетного режима
+        import matplotlib
+        matplotlib.use('Agg', force=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+
+def show_figure(name, fig=None):
+    """
+    Завершает график: в пакетном режиме сохраняет его в OUTPUT_DIR под именем name
+    и закрывает, чтобы фигуры не копились в памяти; иначе вызывает plt.show().
+    name начинается с имени скрипта ('ustoichivost_purchase_comparison'), чтобы графики
+    разных скриптов в одном каталоге не перезаписывали друг друга.
+    Возвращает путь к сохраненному файлу или None.
+    """
+    import matplotlib.pyplot as plt
+
+    if fig is None:
+        fig = plt.gcf()
+    if OUTPUT_DIR is None:
+        plt.show()
+        return None
+
+    settings = RENDER_PROFILES[PROFILE]
+    path = os.path.join(OUTPUT_DIR, f"{name}.{settings['format']}")
+    with stage('render', figure=name, dpi=settings['dpi']):
+        fig.savefig(path, dpi=settings['dpi'], bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def _render_task(output_dir, profile, plot_function, args, kwargs):
+    """Строит один график в рабочем процессе"""
+    configure_rendering(output_dir, profile)
+    plot_function(*args, **kwargs)
+
+
+def render_figures(tasks, n_jobs=None):
+    """
+    Строит несколько графиков. tasks - список (функция, args) или (функция, args, kwargs).
+    В пакетном режиме графики строятся параллельно в отдельных процессах,
+    иначе по очереди в текущем процессе.
+    """
+    tasks = [(task[0], tuple(task[1]), task[2] if len(task) > 2 else {}) for task in tasks]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if OUTPUT_DIR is None or n_jobs == 1 or len(tasks) < 2:
+        for plot_function, args, kwargs in tasks:
+            plot_function(*args, **kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as executor:
+        futures = [executor.submit(_render_task, OUTPUT_DIR, PROFILE, plot_function, args, kwargs)
+                   for plot_function, args, kwargs in tasks]
+        for future in futures:
+            future.result()
+
+
+if OUTPUT_DIR is not None:
+    configure_rendering(OUTPUT_DIR, PROFILE)
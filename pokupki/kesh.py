@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+from zagruzka import CACHE_DIR_NAME
+
+# База результатов лежит в каталоге кэша рядом с tps.csv
+RESULTS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR_NAME, 'results.sqlite')
+
+# Сколько результатов хранить; при переполнении удаляются давно не запрошенные
+MAX_ENTRIES = 1000
+
+
+def fingerprint(name, arrays, params=None):
+    """
+    Ключ результата: SHA-256 от имени расчета, параметров и содержимого массивов
+    (тип, форма и байты каждого массива). Одинаковые входные данные дают одинаковый ключ
+    независимо от того, из какого файла и каким процессом они получены.
+    """
+    digest = hashlib.sha256()
+    digest.update(name.encode('utf-8'))
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _connect(db_path):
+    """Открывает базу результатов, создавая таблицу при первом обращении"""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS results '
+        '(key TEXT PRIMARY KEY, name TEXT, value TEXT, last_used REAL)'
+    )
+    return connection
+
+
+def cached_call(name, function, arrays, params=None, db_path=RESULTS_DB_PATH, max_entries=MAX_ENTRIES):
+    """
+    Возвращает результат function(*arrays, **params) из базы результатов, если он уже
+    считался для тех же данных и параметров, иначе считает и сохраняет.
+    Результат должен быть словарем значений, которые сохраняются в JSON.
+    Если база недоступна, расчет выполняется без кэша.
+    """
+    params = params or {}
+    key = fingerprint(name, arrays, params)
+    try:
+        with _connect(db_path) as connection:
+            row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+                return json.loads(row[0])
+    except (OSError, sqlite3.Error):
+        return function(*arrays, **params)
+
+    result = function(*arrays, **params)
+    try:
+        with _connect(db_path) as connection:
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                               (key, name, json.dumps(result, default=float), time.time()))
+            # Вытеснение давно не использованных результатов (LRU)
+            connection.execute(
+                'DELETE FROM results WHERE key NOT IN '
+                '(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)', (max_entries,)
+            )
+    except (OSError, sqlite3.Error):
+        pass
+    return result
+
+
+def clear_cache(db_path=RESULTS_DB_PATH):
+    """Удаляет все сохраненные результаты"""
+    if os.path.exists(db_path):
+        with _connect(db_path) as connection:
+            connection.execute('DELETE FROM results')
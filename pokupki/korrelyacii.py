@@ -0,0 +1,148 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Подписи значений в ячейках рисуются, только если столбцов не больше этого числа
+ANNOTATION_LIMIT = 20
+
+# Названия столбцов на осях подписываются, только если столбцов не больше этого числа
+TICK_LABEL_LIMIT = 100
+
+# Минимальное число общих наблюдений для расчета корреляции пары столбцов
+MIN_PERIODS = 3
+
+# Относительный порог дисперсии: меньшая дисперсия - ошибка округления у постоянного столбца
+VARIANCE_EPS = 1e-10
+
+
+def _pairwise_pearson(values):
+    """
+    Корреляции Пирсона для всех пар столбцов с попарным исключением пропусков.
+    Столбцы сначала центрируются по своим средним, чтобы суммы квадратов не теряли точность.
+    Без пропусков - одно матричное произведение; с пропусками - суммы по общим строкам
+    каждой пары через произведения с маской.
+    Если дисперсия пары (по общим строкам) не больше VARIANCE_EPS от суммы квадратов,
+    столбец на этих строках считается постоянным и корреляция - nan, как в df.corr.
+    Возвращает матрицу корреляций и матрицу числа общих наблюдений.
+    """
+    valid = ~np.isnan(values)
+    n_rows = values.shape[0]
+    with warnings.catch_warnings():
+        # Полностью пустой столбец: среднее nan, корреляции с ним тоже nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        values = values - np.nanmean(values, axis=0)
+
+    if valid.all():
+        n_obs = np.full((values.shape[1], values.shape[1]), n_rows, dtype=float)
+        sums = values.sum(axis=0)
+        squares = (values ** 2).sum(axis=0)
+        cov = values.T @ values - np.outer(sums, sums) / n_rows
+        var = squares - sums ** 2 / n_rows
+        var = np.where(var > VARIANCE_EPS * squares, var, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return cov / np.sqrt(np.outer(var, var)), n_obs
+
+    mask = valid.astype(float)
+    filled = np.where(valid, values, 0.0)
+    n_obs = mask.T @ mask
+    # sums[i, j] - сумма столбца i по строкам, где заполнены и i, и j
+    sums = filled.T @ mask
+    squares = (filled ** 2).T @ mask
+    products = filled.T @ filled
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = products - sums * sums.T / n_obs
+        var = squares - sums ** 2 / n_obs
+        var = np.where(var > VARIANCE_EPS * squares, var, np.nan)
+        return cov / np.sqrt(var * var.T), n_obs
+
+
+def _pairwise_spearman(values):
+    """
+    Корреляции Спирмена для всех пар столбцов с попарным исключением пропусков, как
+    df.corr('spearman'): ранги пары считаются только по строкам, где заполнены оба столбца.
+    Пары столбцов без пропусков считаются одним расчетом Пирсона по рангам столбцов;
+    пары со столбцами с пропусками переранжируются по своим общим строкам.
+    Возвращает матрицу корреляций и матрицу числа общих наблюдений.
+    """
+    valid = ~np.isnan(values)
+    complete = valid.all(axis=0)
+    corr, n_obs = _pairwise_pearson(stats.rankdata(values, axis=0, nan_policy='omit'))
+
+    for i in np.flatnonzero(~complete):
+        for j in range(values.shape[1]):
+            if j < i and not complete[j]:
+                continue
+            rows = valid[:, i] & valid[:, j]
+            if not rows.any():
+                corr[i, j] = corr[j, i] = np.nan
+                continue
+            ranks = stats.rankdata(values[rows][:, [i, j]], axis=0)
+            corr[i, j] = corr[j, i] = _pairwise_pearson(ranks)[0][0, 1]
+    return corr, n_obs
+
+
+def correlation_matrix(df, method='pearson', min_periods=MIN_PERIODS):
+    """
+    Считает матрицу корреляций (Пирсона или Спирмена) числовых столбцов и p-value.
+    Для Спирмена столбцы переводятся в ранги по общим строкам каждой пары
+    (_pairwise_spearman), затем считается корреляция Пирсона.
+    Для столбцов без разброса на диагонали, как в df.corr, стоит nan.
+    Возвращает три DataFrame: корреляции, p-value и число общих наблюдений.
+    """
+    if method not in ('pearson', 'spearman'):
+        raise ValueError(f"Неизвестный метод корреляции: {method}")
+
+    numeric_df = df.select_dtypes(include=['number']).astype(float)
+    if method == 'spearman':
+        corr, n_obs = _pairwise_spearman(numeric_df.to_numpy())
+    else:
+        corr, n_obs = _pairwise_pearson(numeric_df.to_numpy())
+    corr = np.clip(corr, -1, 1)
+    corr[n_obs < min_periods] = np.nan
+    # Диагональ без разброса остается nan (деление на нулевую дисперсию)
+    diagonal = np.diag(corr)
+    np.fill_diagonal(corr, np.where(np.isnan(diagonal), np.nan, 1.0))
+
+    # p-value двустороннего теста по t-распределению с n - 2 степенями свободы
+    dof = n_obs - 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_stat = corr * np.sqrt(dof / (1 - corr ** 2))
+        p_values = 2 * stats.t.sf(np.abs(t_stat), dof)
+    np.fill_diagonal(p_values, 0.0)
+
+    columns = numeric_df.columns
+    return (pd.DataFrame(corr, index=columns, columns=columns),
+            pd.DataFrame(p_values, index=columns, columns=columns),
+            pd.DataFrame(n_obs.astype(int), index=columns, columns=columns))
+
+
+def plot_correlation_heatmap(corr_matrix, title='Матрица корреляций', annotation_limit=ANNOTATION_LIMIT):
+    """
+    Рисует матрицу корреляций одним изображением (imshow).
+    Подписи значений добавляются только для небольших матриц.
+    """
+    import matplotlib.pyplot as plt
+    from grafiki import show_figure
+
+    n_columns = len(corr_matrix.columns)
+    size = min(max(8, n_columns * 0.2), 16)
+    fig, ax = plt.subplots(figsize=(size + 2, size))
+    image = ax.imshow(corr_matrix.to_numpy(), cmap='coolwarm', vmin=-1, vmax=1, interpolation='nearest')
+    if n_columns <= TICK_LABEL_LIMIT:
+        ax.set_xticks(range(n_columns))
+        ax.set_xticklabels(corr_matrix.columns, rotation=90)
+        ax.set_yticks(range(n_columns))
+        ax.set_yticklabels(corr_matrix.columns)
+    fig.colorbar(image, ax=ax)
+    ax.set_title(title, fontsize=16)
+
+    # Добавление значений на блоки
+    if n_columns <= annotation_limit:
+        for (i, j), value in np.ndenumerate(corr_matrix.to_numpy()):
+            ax.text(j, i, f'{value:.2f}', ha="center", va="center", color="black")
+
+    fig.tight_layout()
+    show_figure('korrelyacii_correlation_matrix', fig)
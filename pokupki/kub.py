@@ -0,0 +1,182 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from zagruzka import CACHE_DIR_NAME, HAS_PYARROW, load_employee_data
+from matrica import cached_purchase_matrix
+
+# Уровни оргструктуры в tps.csv, от верхнего к нижнему
+HIERARCHY = ['Факт. департамент', 'Факт. подразделение', 'Факт. группа']
+
+# Значение уровня в строках-итогах ("все подразделения департамента" и т.п.).
+# Может совпасть с настоящим названием, поэтому узлы ищутся по столбцу 'Уровень'
+ALL_LABEL = 'Все'
+
+# Значение уровня, если в таблице сотрудников оно не заполнено (как в самой выгрузке)
+UNKNOWN_LABEL = 'Не указано'
+
+# Версия расчета входит в имя сохраненного куба: меняется вместе с build_cube,
+# чтобы кубы старого формата не читались
+CUBE_VERSION = 2
+
+
+def build_cube(employee_data, matrix, categories, hierarchy=HIERARCHY):
+    """
+    Куб по оргструктуре: для каждого узла иерархии (итог по компании, департамент,
+    департамент + подразделение, ...) - число сотрудников, средняя продуктивность,
+    доля эффективных, число покупок всего и по категориям.
+    Сотрудники и матрица покупок проходятся один раз - считаются итоги по листьям
+    (различным сочетаниям всех уровней), а верхние уровни получаются суммированием листьев,
+    как GROUPING SETS в SQL.
+    matrix - матрица сотрудники x категории (matrica) в порядке строк employee_data.
+    Возвращает DataFrame с индексом по уровням иерархии, отсортированный для быстрого поиска.
+    """
+    levels = employee_data[hierarchy].astype(object).fillna(UNKNOWN_LABEL).astype(str)
+    grouped = levels.groupby(hierarchy, sort=True)
+    leaf_key = grouped.ngroup().to_numpy()
+    leaves = grouped.size().index
+    n_leaves = len(leaves)
+
+    productivity = employee_data['Продуктивность сотрудника'].to_numpy(dtype=float)
+    rated = ~np.isnan(productivity)
+    effectiveness = employee_data['Эффективность']
+    known = effectiveness.notna().to_numpy()
+    effective = (effectiveness == True).to_numpy()
+
+    # Покупки листьев - одно произведение разреженной матрицы принадлежности на матрицу покупок
+    indicator = sparse.csr_matrix(
+        (np.ones(len(leaf_key)), (leaf_key, np.arange(len(leaf_key)))), shape=(n_leaves, len(leaf_key))
+    )
+    purchases = (indicator @ matrix).toarray().astype(np.int64)
+
+    category_columns = [str(category) for category in categories]
+    leaf_totals = pd.DataFrame(purchases, index=leaves, columns=category_columns)
+    leaf_totals.insert(0, 'Покупок', purchases.sum(axis=1))
+    leaf_totals.insert(0, '_эффективных', np.bincount(leaf_key, weights=effective & known, minlength=n_leaves))
+    leaf_totals.insert(0, '_с эффективностью', np.bincount(leaf_key, weights=known, minlength=n_leaves))
+    leaf_totals.insert(0, '_сумма продуктивности',
+                       np.bincount(leaf_key[rated], weights=productivity[rated], minlength=n_leaves))
+    leaf_totals.insert(0, '_с продуктивностью', np.bincount(leaf_key, weights=rated, minlength=n_leaves))
+    leaf_totals.insert(0, 'Сотрудников', np.bincount(leaf_key, minlength=n_leaves))
+
+    # Итоги верхних уровней: суммы листьев по первым depth уровням
+    rollups = []
+    for depth in range(len(hierarchy) + 1):
+        if depth == 0:
+            totals = leaf_totals.sum().to_frame().T
+        else:
+            totals = leaf_totals.groupby(level=list(range(depth)), sort=True).sum()
+        totals = totals.reset_index(drop=depth == 0)
+        for column in hierarchy[depth:]:
+            totals[column] = ALL_LABEL
+        totals['Уровень'] = depth
+        rollups.append(totals)
+
+    cube = pd.concat(rollups, ignore_index=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cube['Средняя продуктивность'] = cube['_сумма продуктивности'] / cube['_с продуктивностью']
+        cube['Доля эффективных'] = cube['_эффективных'] / cube['_с эффективностью']
+    cube = cube.drop(columns=[column for column in cube.columns if column.startswith('_')])
+
+    metrics = ['Уровень', 'Сотрудников', 'Средняя продуктивность', 'Доля эффективных', 'Покупок']
+    cube = cube[hierarchy + metrics + category_columns]
+    # Итог по компании проходит через sum().to_frame().T и приходит с float: счетчики снова целые
+    counts = ['Сотрудников', 'Покупок'] + category_columns
+    cube[counts] = cube[counts].astype(np.int64)
+    return cube.set_index(hierarchy).sort_index()
+
+
+def _cube_path(employee_data_path, purchase_data_path):
+    """Файл сохраненного куба в каталоге кэша; ключом служат версия расчета, размеры и mtime исходных файлов"""
+    key = []
+    for path in (employee_data_path, purchase_data_path):
+        stat = os.stat(path)
+        key.append(f'{stat.st_size}-{stat.st_mtime_ns}')
+    directory, name = os.path.split(os.path.abspath(employee_data_path))
+    base = os.path.splitext(name)[0]
+    purchase_base = os.path.splitext(os.path.basename(purchase_data_path))[0]
+    return os.path.join(directory, CACHE_DIR_NAME, f'{base}-{purchase_base}-cube-v{CUBE_VERSION}-{"-".join(key)}.feather')
+
+
+def _remove_stale_cubes(cube_path):
+    """Удаляет кубы, построенные по старым версиям исходных файлов"""
+    prefix = os.path.basename(cube_path).rsplit('-cube-', 1)[0]
+    pattern = os.path.join(glob.escape(os.path.dirname(cube_path)), f'{glob.escape(prefix)}-cube-*.feather')
+    for stale in glob.glob(pattern):
+        if stale != cube_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def cached_cube(employee_data_path, purchase_data_path, hierarchy=HIERARCHY):
+    """
+    Возвращает куб для пары файлов, строя и сохраняя его (Feather) при первом обращении.
+    Дальше запросы по узлам - поиск по отсортированному индексу, без прохода по покупкам.
+    Без pyarrow куб считается при каждом вызове.
+    """
+    if HAS_PYARROW:
+        cube_path = _cube_path(employee_data_path, purchase_data_path)
+        if os.path.exists(cube_path):
+            return pd.read_feather(cube_path).set_index(hierarchy)
+
+    employee_data = load_employee_data(employee_data_path)
+    matrix, _, categories = cached_purchase_matrix(employee_data_path, purchase_data_path)
+    cube = build_cube(employee_data, matrix, categories, hierarchy)
+
+    if HAS_PYARROW:
+        tmp_path = f'{cube_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(cube_path), exist_ok=True)
+            cube.reset_index().to_feather(tmp_path)
+            os.replace(tmp_path, cube_path)
+            _remove_stale_cubes(cube_path)
+        except OSError:
+            # Каталог может быть недоступен для записи: работаем без сохранения
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return cube
+
+
+def cube_node(cube, *path):
+    """
+    Строка куба для узла иерархии: cube_node(cube) - компания, cube_node(cube, департамент) и т.д.
+    Узел выбирается по 'Уровень', а не по ALL_LABEL в индексе: подразделение с названием
+    'Все' не спутается с итогом департамента.
+    """
+    rows = cube.xs(tuple(path), level=list(range(len(path))), drop_level=False) if path else cube
+    node = rows[rows['Уровень'] == len(path)]
+    if node.empty:
+        raise KeyError(path)
+    return node.iloc[0]
+
+
+def drill_down(cube, *path):
+    """Дочерние узлы узла path (уровнем ниже), например подразделения департамента"""
+    rows = cube.xs(tuple(path), level=list(range(len(path))), drop_level=False) if path else cube
+    return rows[rows['Уровень'] == len(path) + 1]
+
+
+if __name__ == "__main__":
+    employee_data_path = 'pokupki/tps.csv'
+    purchase_data_path = 'pokupki/p.csv'
+
+    try:
+        cube = cached_cube(employee_data_path, purchase_data_path)
+        print("Итог по компании:")
+        print(cube[cube['Уровень'] == 0].round(3).to_string())
+
+        departments = drill_down(cube).sort_values('Сотрудников', ascending=False)
+        print("\nДепартаменты:")
+        print(departments.round(3).to_string())
+
+        largest = departments.index[0][0]
+        print(f"\nПодразделения: {largest}")
+        print(drill_down(cube, largest).round(3).to_string())
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
@@ -0,0 +1,149 @@
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from zagruzka import CACHE_DIR_NAME, load_employee_data, load_purchase_data, encode_tables
+from agregacia import employee_row_keys
+
+# Тип счетчиков в матрице покупок
+MATRIX_DTYPE = np.int32
+
+# Массивы CSR-матрицы, которые сохраняются отдельными .npy (их можно отображать в память)
+MATRIX_ARRAYS = ('data', 'indices', 'indptr')
+
+
+def build_purchase_matrix(employee_data, purchase_data):
+    """
+    Строит разреженную матрицу покупок (scipy.sparse CSR): строки - сотрудники
+    в порядке таблицы сотрудников (tps.csv), столбцы - категории, значения - число покупок.
+    Сотрудники без покупок остаются нулевыми строками, покупки сотрудников не из таблицы
+    и покупки без категории не учитываются.
+    Возвращает матрицу, индекс кодов сотрудников и индекс категорий.
+    """
+    employee_codes = pd.Index(employee_data['Код сотрудника'])
+    employee_key = employee_row_keys(employee_data['Код сотрудника'], purchase_data['Код сотрудника'])
+
+    purchase_categories = purchase_data['Категория']
+    if isinstance(purchase_categories.dtype, pd.CategoricalDtype):
+        category_key = purchase_categories.cat.codes.to_numpy()
+        categories = purchase_categories.cat.categories
+    else:
+        category_key, categories = pd.factorize(purchase_categories.to_numpy())
+
+    matched = (employee_key >= 0) & (category_key >= 0)
+    matrix = sparse.csr_matrix(
+        (np.ones(matched.sum(), dtype=MATRIX_DTYPE), (employee_key[matched], category_key[matched])),
+        shape=(len(employee_codes), len(categories))
+    )
+    # Повторные покупки одной категории складываются в одну ячейку
+    matrix.sum_duplicates()
+    return matrix, employee_codes, pd.Index(categories, name='Категория')
+
+
+def group_category_counts(matrix, categories, groups):
+    """
+    Суммирует строки матрицы покупок по группам сотрудников (например, по 'Эффективность').
+    groups - значение группы для каждой строки матрицы; строки без группы пропускаются.
+    Все группы считаются одним произведением разреженных матриц.
+    Возвращает DataFrame: категории x группы, число покупок.
+    """
+    group_key, group_values = pd.factorize(np.asarray(groups), sort=True)
+    rows = np.flatnonzero(group_key >= 0)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=MATRIX_DTYPE), (group_key[rows], rows)),
+        shape=(len(group_values), matrix.shape[0])
+    )
+    counts = (indicator @ matrix).toarray().T
+    return pd.DataFrame(counts, index=categories, columns=group_values)
+
+
+def subset_category_counts(matrix, categories, rows):
+    """Число покупок по категориям для подмножества строк (булева маска или номера строк)"""
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    counts = np.asarray(matrix[rows].sum(axis=0)).ravel()
+    return pd.Series(counts, index=categories)
+
+
+def _matrix_dir(employee_data_path, purchase_data_path):
+    """
+    Каталог сохраненной матрицы рядом с кэшем tps.csv.
+    Ключом служат размеры и mtime обоих исходных файлов.
+    """
+    key = []
+    for path in (employee_data_path, purchase_data_path):
+        stat = os.stat(path)
+        key.append(f'{stat.st_size}-{stat.st_mtime_ns}')
+    directory, name = os.path.split(os.path.abspath(employee_data_path))
+    base = os.path.splitext(name)[0]
+    purchase_base = os.path.splitext(os.path.basename(purchase_data_path))[0]
+    return os.path.join(directory, CACHE_DIR_NAME, f'{base}-{purchase_base}-matrix-{"-".join(key)}')
+
+
+def save_purchase_matrix(matrix_dir, matrix, employee_codes, categories):
+    """
+    Сохраняет матрицу покупок в каталог: массивы CSR - в .npy, коды сотрудников
+    и категории - в labels.json. Каталог сначала пишется во временный и затем переименовывается.
+    """
+    tmp_dir = f'{matrix_dir}.{os.getpid()}.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in MATRIX_ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), getattr(matrix, name))
+    labels = {
+        'shape': list(matrix.shape),
+        'employee_codes': employee_codes.tolist(),
+        'categories': categories.tolist(),
+    }
+    with open(os.path.join(tmp_dir, 'labels.json'), 'w', encoding='utf-8') as f:
+        json.dump(labels, f, ensure_ascii=False)
+    os.replace(tmp_dir, matrix_dir)
+
+
+def load_purchase_matrix(matrix_dir, mmap_mode='r'):
+    """
+    Загружает сохраненную матрицу покупок. При mmap_mode='r' массивы не читаются в память
+    целиком, а отображаются из файлов, так что матрицу могут открыть несколько процессов.
+    """
+    with open(os.path.join(matrix_dir, 'labels.json'), encoding='utf-8') as f:
+        labels = json.load(f)
+    arrays = [np.load(os.path.join(matrix_dir, f'{name}.npy'), mmap_mode=mmap_mode) for name in MATRIX_ARRAYS]
+    matrix = sparse.csr_matrix(tuple(arrays), shape=tuple(labels['shape']), copy=False)
+    return matrix, pd.Index(labels['employee_codes']), pd.Index(labels['categories'], name='Категория')
+
+
+def _remove_stale_matrices(matrix_dir):
+    """
+    Удаляет матрицы, построенные по старым версиям исходных файлов.
+    Временные каталоги (.tmp) не трогаются: их может дописывать другой процесс.
+    """
+    prefix = os.path.basename(matrix_dir).rsplit('-matrix-', 1)[0]
+    pattern = os.path.join(glob.escape(os.path.dirname(matrix_dir)), f'{glob.escape(prefix)}-matrix-*')
+    for stale in glob.glob(pattern):
+        if stale != matrix_dir and not stale.endswith('.tmp'):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def cached_purchase_matrix(employee_data_path, purchase_data_path, mmap_mode='r'):
+    """
+    Возвращает матрицу покупок для пары файлов, строя и сохраняя ее при первом обращении.
+    Матрица пересобирается, только если у tps.csv или файла покупок изменились размер или mtime.
+    """
+    matrix_dir = _matrix_dir(employee_data_path, purchase_data_path)
+    if os.path.isdir(matrix_dir):
+        return load_purchase_matrix(matrix_dir, mmap_mode)
+
+    employee_data, purchase_data = encode_tables(load_employee_data(employee_data_path),
+                                                 load_purchase_data(purchase_data_path))
+    matrix, employee_codes, categories = build_purchase_matrix(employee_data, purchase_data)
+    try:
+        save_purchase_matrix(matrix_dir, matrix, employee_codes, categories)
+        _remove_stale_matrices(matrix_dir)
+    except OSError:
+        # Каталог может быть недоступен для записи или матрицу уже сохранил другой процесс
+        shutil.rmtree(f'{matrix_dir}.{os.getpid()}.tmp', ignore_errors=True)
+    return matrix, employee_codes, categories
@@ -0,0 +1,51 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Миссии, выполнение которых делает сотрудника эффективным
+KEY_MISSIONS = ['Креативный класс', 'HiPo', 'HiPro', 'Звезда департамента']
+
+
+def flag_columns(key_missions=KEY_MISSIONS):
+    """Названия столбцов-флагов 'Выполнил ...' для ключевых миссий"""
+    return [f'Выполнил {mission}' for mission in key_missions]
+
+
+def classify_titles(titles, key_missions=KEY_MISSIONS):
+    """
+    Определяет, какие ключевые миссии упоминаются в каждом названии (поиск подстроки).
+    Все ключевые миссии собраны в одно регулярное выражение: названия без совпадений
+    (их большинство) отсеиваются за один поиск, и только совпавшие проверяются
+    по каждой миссии отдельно. Возвращает булев массив (названия x миссии).
+    """
+    patterns = [re.compile(re.escape(mission)) for mission in key_missions]
+    any_key_mission = re.compile('|'.join(pattern.pattern for pattern in patterns))
+
+    flags = np.zeros((len(titles), len(key_missions)), dtype=bool)
+    for i, title in enumerate(titles):
+        if isinstance(title, str) and any_key_mission.search(title):
+            flags[i] = [pattern.search(title) is not None for pattern in patterns]
+    return flags
+
+
+def match_key_missions(mission_titles, key_missions=KEY_MISSIONS):
+    """
+    Строит флаги 'Выполнил ...' и столбец 'Эффективность' для каждой строки журнала миссий.
+    Каждое уникальное название классифицируется один раз, результаты переносятся
+    на строки через целочисленные коды названий (коды Categorical или pd.factorize).
+    """
+    if isinstance(mission_titles.dtype, pd.CategoricalDtype):
+        codes = mission_titles.cat.codes.to_numpy()
+        unique_titles = mission_titles.cat.categories
+    else:
+        codes, unique_titles = pd.factorize(mission_titles)
+
+    # Последняя строка таблицы - для пропущенных названий (код -1)
+    title_flags = np.vstack([classify_titles(unique_titles, key_missions),
+                             np.zeros((1, len(key_missions)), dtype=bool)])
+    row_flags = title_flags[codes]
+
+    flags = pd.DataFrame(row_flags, columns=flag_columns(key_missions), index=mission_titles.index)
+    flags['Эффективность'] = row_flags.any(axis=1)
+    return flags
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Уровень значимости и целевая мощность по умолчанию
+ALPHA = 0.05
+TARGET_POWER = 0.8
+
+# Границы и число шагов поиска необходимого размера группы (бисекция по log n)
+MIN_NOBS = 2
+MAX_NOBS = 1e7
+N_BISECTIONS = 60
+
+
+def ttest_power(effect_size, nobs1, ratio=1.0, alpha=ALPHA, alternative='two-sided'):
+    """
+    Мощность двухвыборочного t-теста через нецентральное t-распределение.
+    nobs1 - размер первой группы, ratio - отношение nobs2 / nobs1 (группы могут быть разного размера).
+    Все аргументы - числа или массивы, которые транслируются друг с другом (numpy broadcasting),
+    так что сетка значений считается одним вызовом. Совпадает с TTestIndPower().power(...).
+    """
+    effect_size, nobs1, ratio, alpha = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (effect_size, nobs1, ratio, alpha))
+    )
+    nobs2 = nobs1 * ratio
+    df = nobs1 + nobs2 - 2
+    noncentrality = effect_size * np.sqrt(nobs1 * nobs2 / (nobs1 + nobs2))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if alternative == 'two-sided':
+            critical = stats.t.isf(alpha / 2, df)
+            power = stats.nct.sf(critical, df, noncentrality) + stats.nct.cdf(-critical, df, noncentrality)
+        elif alternative == 'larger':
+            power = stats.nct.sf(stats.t.isf(alpha, df), df, noncentrality)
+        elif alternative == 'smaller':
+            power = stats.nct.cdf(-stats.t.isf(alpha, df), df, noncentrality)
+        else:
+            raise ValueError(f"Неизвестная альтернатива: {alternative}")
+
+        # При большой нецентральности scipy.stats.nct возвращает nan; там df велико
+        # и t-распределение заменяется нормальным
+        failed = np.isnan(power) & np.isfinite(noncentrality) & (df > 0)
+        if failed.any():
+            power = np.where(failed, _normal_power(noncentrality, alpha, alternative), power)
+    return power
+
+
+def _normal_power(noncentrality, alpha, alternative):
+    """Мощность z-теста - приближение мощности t-теста при большом числе степеней свободы"""
+    if alternative == 'two-sided':
+        critical = stats.norm.isf(alpha / 2)
+        return stats.norm.sf(critical - noncentrality) + stats.norm.cdf(-critical - noncentrality)
+    if alternative == 'larger':
+        return stats.norm.sf(stats.norm.isf(alpha) - noncentrality)
+    return stats.norm.cdf(-stats.norm.isf(alpha) - noncentrality)
+
+
+def required_nobs1(effect_size, ratio=1.0, alpha=ALPHA, power=TARGET_POWER, alternative='two-sided'):
+    """
+    Размер первой группы, при котором t-тест достигает мощности power (дробное число,
+    как TTestIndPower().solve_power(nobs1=None)). Считается бисекцией сразу для всей сетки:
+    мощность растет с размером группы, поэтому каждая итерация - один векторный вызов ttest_power.
+    Если мощность недостижима даже при MAX_NOBS, возвращается nan.
+    """
+    effect_size, ratio, alpha, power = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (effect_size, ratio, alpha, power))
+    )
+    low = np.full(effect_size.shape, np.log(MIN_NOBS))
+    high = np.full(effect_size.shape, np.log(MAX_NOBS))
+
+    for _ in range(N_BISECTIONS):
+        middle = (low + high) / 2
+        enough = ttest_power(effect_size, np.exp(middle), ratio, alpha, alternative) >= power
+        high = np.where(enough, middle, high)
+        low = np.where(enough, low, middle)
+
+    nobs1 = np.exp(high)
+    reachable = ttest_power(effect_size, MAX_NOBS, ratio, alpha, alternative) >= power
+    return np.where(reachable, nobs1, np.nan)
+
+
+def power_table(effect_sizes, nobs1, ratios=(1.0,), alphas=(ALPHA,), power=TARGET_POWER):
+    """
+    Таблица мощности по сетке размер эффекта x уровень значимости x отношение групп
+    для заданного размера первой группы nobs1, с необходимым размером группы для мощности power.
+    """
+    grid = pd.MultiIndex.from_product([effect_sizes, alphas, ratios],
+                                      names=['Размер эффекта', 'Уровень значимости', 'Отношение групп'])
+    effect_size = grid.get_level_values(0).to_numpy(dtype=float)
+    alpha = grid.get_level_values(1).to_numpy(dtype=float)
+    ratio = grid.get_level_values(2).to_numpy(dtype=float)
+
+    return pd.DataFrame({
+        'Мощность': ttest_power(effect_size, nobs1, ratio, alpha),
+        'Необходимый размер группы': required_nobs1(effect_size, ratio, alpha, power),
+    }, index=grid).reset_index()
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from chtenie import STREAM_BLOCK_BYTES, iter_csv_quarantined
+from zamery import stage
+
+# Столбцы журнала вознаграждений (how.csv)
+MISSION_COLUMN = 'Название миссии'
+REWARD_COLUMN = 'Сумма вознаграждения'
+
+# Число миссий в топе по умолчанию
+TOP_K = 10
+
+
+def _new_accumulators():
+    """Пустая таблица накопителей: индекс групп и массивы сумм и количеств по номеру группы"""
+    return {'keys': pd.Index([], dtype=object), 'sums': np.zeros(0), 'counts': np.zeros(0, dtype=np.int64)}
+
+
+def _grow(array, size):
+    """Увеличивает массив накопителей с запасом (вдвое), чтобы не копировать его на каждой порции"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def accumulate_rewards(accumulators, keys, rewards):
+    """
+    Добавляет порцию строк к накопителям. Внутри порции группы кодируются через pd.factorize
+    и суммируются np.bincount, затем коды порции переводятся в номера групп таблицы
+    (новые группы дописываются в конец).
+    Как groupby().agg(['sum', 'mean', 'count']): строки без группы пропускаются,
+    пропуски в вознаграждении не входят ни в сумму, ни в количество.
+    """
+    codes, uniques = pd.factorize(keys)
+    rewards = np.asarray(rewards, dtype=float)
+    has_group = codes >= 0
+    has_reward = has_group & ~np.isnan(rewards)
+
+    chunk_sums = np.bincount(codes[has_reward], weights=rewards[has_reward], minlength=len(uniques))
+    chunk_counts = np.bincount(codes[has_reward], minlength=len(uniques))
+
+    slots = accumulators['keys'].get_indexer(uniques)
+    new = slots < 0
+    if new.any():
+        n_known = len(accumulators['keys'])
+        slots[new] = np.arange(n_known, n_known + new.sum())
+        accumulators['keys'] = accumulators['keys'].append(pd.Index(uniques[new], dtype=object))
+        accumulators['sums'] = _grow(accumulators['sums'], len(accumulators['keys']))
+        accumulators['counts'] = _grow(accumulators['counts'], len(accumulators['keys']))
+
+    # Номера групп внутри порции не повторяются, поэтому достаточно обычного сложения по индексу
+    accumulators['sums'][slots] += chunk_sums
+    accumulators['counts'][slots] += chunk_counts
+    return accumulators
+
+
+def stream_reward_totals(reward_log_path, group_column=MISSION_COLUMN, reward_column=REWARD_COLUMN,
+                         block_size=STREAM_BLOCK_BYTES):
+    """
+    Потоково считает сумму, количество и среднее вознаграждение по группам (по умолчанию - миссиям).
+    В памяти держится одна порция журнала и по два числа на группу.
+    Возвращает DataFrame с индексом group_column и столбцами 'sum', 'mean', 'count'.
+    """
+    accumulators = _new_accumulators()
+    with stage('aggregate', path=reward_log_path, streaming=True) as record:
+        record['rows'] = 0
+        for chunk in iter_csv_quarantined(reward_log_path, [group_column, reward_column], block_size=block_size):
+            record['rows'] += len(chunk)
+            rewards = pd.to_numeric(chunk[reward_column], errors='coerce')
+            accumulate_rewards(accumulators, chunk[group_column].to_numpy(), rewards.to_numpy())
+
+    n = len(accumulators['keys'])
+    sums = accumulators['sums'][:n]
+    counts = accumulators['counts'][:n]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return pd.DataFrame({'sum': sums, 'mean': means, 'count': counts},
+                        index=pd.Index(accumulators['keys'], name=group_column))
+
+
+def top_k(totals, k=TOP_K, by='sum'):
+    """
+    Выбирает k строк с наибольшим значением столбца by частичным отбором (np.argpartition)
+    и сортирует только их, без сортировки всей таблицы.
+    """
+    values = totals[by].to_numpy(dtype=float)
+    # Пропуски (среднее без вознаграждений) ставятся в конец
+    values = np.where(np.isnan(values), -np.inf, values)
+    if k < len(values):
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+    order = candidates[np.argsort(-values[candidates], kind='stable')]
+    return totals.iloc[order]
+
+
+def top_rewards(reward_log_path, k=TOP_K, group_column=MISSION_COLUMN, reward_column=REWARD_COLUMN, by='sum'):
+    """Топ-k групп журнала вознаграждений по столбцу by ('sum', 'mean' или 'count')"""
+    return top_k(stream_reward_totals(reward_log_path, group_column, reward_column), k, by)
+
+
+if __name__ == "__main__":
+    # Путь к журналу вознаграждений
+    reward_log_path = 'how.csv'
+
+    try:
+        print(top_rewards(reward_log_path))
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from rangi import histogram_max_value, row_histograms
+
+# Сколько перестановок обрабатывается одной матрицей; ограничивает память процесса
+DEFAULT_BLOCK_SIZE = 1000
+
+
+def _medians_from_histograms(histograms, size):
+    """Медианы по гистограммам значений (строка - гистограмма одной выборки размера size)"""
+    cumulative = histograms.cumsum(axis=1)
+    # Для четного размера медиана - среднее двух центральных порядковых статистик
+    lower = np.argmax(cumulative >= (size + 1) // 2, axis=1)
+    upper = np.argmax(cumulative >= size // 2 + 1, axis=1)
+    return (lower + upper) / 2
+
+
+def _permutation_block(pooled, n_effective, n_permutations, observed, seed, max_value=None):
+    """
+    Выполняет блок перестановок и возвращает, сколько раз перестановочная статистика
+    по модулю не меньше наблюдаемой (для разницы средних и медиан).
+    Случайное разбиение строится частичной сортировкой случайных ключей: первые
+    n_effective элементов после argpartition - равномерная выборка без возвращения.
+    Статистики второй группы получаются вычитанием из итогов по всей выборке.
+    """
+    rng = np.random.default_rng(seed)
+    n_ineffective = len(pooled) - n_effective
+    order = np.argpartition(rng.random((n_permutations, len(pooled)), dtype=np.float32), n_effective, axis=1)
+    effective = pooled[order[:, :n_effective]]
+
+    effective_sum = effective.sum(axis=1)
+    mean_diff = effective_sum / n_effective - (pooled.sum() - effective_sum) / n_ineffective
+
+    if max_value is None:
+        ineffective = pooled[order[:, n_effective:]]
+        median_diff = np.median(effective, axis=1) - np.median(ineffective, axis=1)
+    else:
+        width = max_value + 1
+        effective_hist = row_histograms(effective, width)
+        ineffective_hist = np.bincount(pooled, minlength=width) - effective_hist
+        median_diff = (_medians_from_histograms(effective_hist, n_effective)
+                       - _medians_from_histograms(ineffective_hist, n_ineffective))
+
+    # Допуск защищает от ошибок округления при сравнении равных разниц
+    tolerance = 1e-9
+    return (np.count_nonzero(np.abs(mean_diff) >= observed[0] - tolerance),
+            np.count_nonzero(np.abs(median_diff) >= observed[1] - tolerance))
+
+
+def _p_value_interval(hits, n_done, confidence):
+    """p-value перестановочного теста и нормальный доверительный интервал для него"""
+    p_value = (hits + 1) / (n_done + 1)
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    half_width = z * np.sqrt(p_value * (1 - p_value) / n_done)
+    return p_value, np.maximum(p_value - half_width, 0), np.minimum(p_value + half_width, 1), half_width
+
+
+def permutation_test(effective_counts, ineffective_counts, n_permutations=100_000, seed=0,
+                     n_jobs=None, block_size=DEFAULT_BLOCK_SIZE, tolerance=0.005, confidence=0.99,
+                     min_permutations=10_000):
+    """
+    Двусторонний перестановочный тест для разницы средних и медиан эффективных и
+    неэффективных сотрудников. Не требует нормальности и подходит для счетчиков с
+    большим числом нулей.
+
+    Перестановки считаются векторизованными блоками по block_size и распределяются
+    по n_jobs процессам (None - по числу ядер, 1 - без пула процессов). Каждый блок
+    получает свое зерно из seed, поэтому результат не зависит от числа процессов.
+    Расчет останавливается досрочно, когда полуширина доверительного интервала
+    p-value для обеих статистик становится не больше tolerance.
+
+    Возвращает DataFrame с наблюдаемой статистикой, p-value, его доверительным
+    интервалом и числом выполненных перестановок.
+    """
+    effective_counts = np.asarray(effective_counts, dtype=float)
+    ineffective_counts = np.asarray(ineffective_counts, dtype=float)
+    if len(effective_counts) < 1 or len(ineffective_counts) < 1:
+        raise ValueError("Для перестановочного теста нужна хотя бы одна запись в каждой группе")
+
+    pooled = np.concatenate([effective_counts, ineffective_counts])
+    n_effective = len(effective_counts)
+    max_value = histogram_max_value(pooled)
+    if max_value is not None:
+        pooled = pooled.astype(np.int64)
+    observed_diff = np.array([
+        np.mean(effective_counts) - np.mean(ineffective_counts),
+        np.median(effective_counts) - np.median(ineffective_counts),
+    ])
+    observed = np.abs(observed_diff)
+
+    n_blocks = -(-n_permutations // block_size)
+    block_sizes = [min(block_size, n_permutations - i * block_size) for i in range(n_blocks)]
+    block_seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+
+    hits = np.zeros(2, dtype=np.int64)
+    n_done = 0
+    stopped = False
+    try:
+        # Блоки считаются волнами по n_jobs, но точность проверяется после каждого блока
+        # по порядку: остановка приходится на ту же границу блока при любом n_jobs,
+        # а блоки волны после нее отбрасываются
+        for wave_start in range(0, n_blocks, n_jobs):
+            wave = range(wave_start, min(wave_start + n_jobs, n_blocks))
+            args = [(pooled, n_effective, block_sizes[i], observed, block_seeds[i], max_value) for i in wave]
+            if executor is None:
+                results = [_permutation_block(*a) for a in args]
+            else:
+                results = list(executor.map(_permutation_block, *zip(*args)))
+
+            for i, block_hits in zip(wave, results):
+                hits += block_hits
+                n_done += block_sizes[i]
+                if n_done >= min_permutations:
+                    half_width = _p_value_interval(hits, n_done, confidence)[3]
+                    if np.all(half_width <= tolerance):
+                        stopped = True
+                        break
+            if stopped:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    p_value, ci_low, ci_high, _ = _p_value_interval(hits, n_done, confidence)
+    return pd.DataFrame({
+        'Наблюдаемая разница': observed_diff,
+        'p-value': p_value,
+        'Нижняя граница': ci_low,
+        'Верхняя граница': ci_high,
+        'Перестановок': n_done,
+    }, index=['Разница средних', 'Разница медиан'])
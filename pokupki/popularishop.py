@@ -1,11 +1,16 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from grafiki import show_figure
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from zamery import logger, setup_logging, stage
+from agregacia import aggregate_purchases
 
 def analyze_purchases(employee_data_path, purchase_data_path):
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
-        print(purchase_data.columns)
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
+        logger.debug("Столбцы покупок: %s", list(purchase_data.columns))
+        # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+        employee_data, purchase_data = encode_tables(employee_data, purchase_data)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
 
@@ -13,75 +18,79 @@ def analyze_purchases(employee_data_path, purchase_data_path):
     # Фильтруем только эффективных сотрудников
     effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
 
-    print("Effective employees:", effective_employees)
-    print("Purchase data head:", purchase_data.head())
+    logger.debug("Effective employees: %d", len(effective_employees))
+    logger.debug("Purchase data head:\n%s", purchase_data.head())
 
-    high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+    with stage('filter', rows=len(purchase_data)) as record:
+        high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+        record['selected'] = int(high_productivity_purchases.sum())
 
-    print("Is high_productivity_purchases empty?", high_productivity_purchases.empty)
+    logger.debug("Is high_productivity_purchases empty? %s", high_productivity_purchases.empty)
 
     category_distribution = purchase_data[high_productivity_purchases]['Категория'].value_counts()
+    # value_counts по Categorical возвращает и категории без покупок
+    category_distribution = category_distribution[category_distribution > 0]
 
     category_distribution_df = pd.DataFrame({'Категория': category_distribution.index, 'count': category_distribution.values})
 
     return category_distribution_df, purchase_data, employee_data
 
-def compare_store_popularity(employee_data, purchase_data):
+def compare_store_popularity(employee_data, purchase_data, aggregates=None, test=None, alpha=None):
     """
     Сравнивает популярность магазинов среди эффективных и неэффективных сотрудников,
     учитывая разницу в их количестве.
+    Готовые агрегаты из aggregate_purchases можно передать через aggregates,
+    чтобы не проходить по покупкам повторно.
+    test='mannwhitney' или 'poisson' добавляет проверку значимости различий по каждой
+    категории с поправкой Бенджамини-Хохберга; тогда таблица сортируется по p-value.
+    alpha - уровень значимости после поправки (по умолчанию znachimost.FDR_ALPHA).
     """
-    effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
-    ineffective_employees = employee_data[employee_data['Эффективность'] == False]['Код сотрудника']
-
-    # Фильтруем покупки, сделанные эффективными и неэффективными сотрудниками
-    effective_purchases = purchase_data[purchase_data['Код сотрудника'].isin(effective_employees)]
-    ineffective_purchases = purchase_data[purchase_data['Код сотрудника'].isin(ineffective_employees)]
+    if aggregates is None:
+        aggregates = aggregate_purchases(employee_data, purchase_data)
 
-    # Считаем количество покупок в каждом магазине для каждой группы
-    effective_store_counts = effective_purchases['Категория'].value_counts()
-    ineffective_store_counts = ineffective_purchases['Категория'].value_counts()
+    # Количество покупок в каждом магазине для каждой группы
+    store_counts = aggregates['category_counts'].reindex(columns=[True, False], fill_value=0)
 
     # Нормализуем данные, чтобы учесть разницу в количестве сотрудников
-    effective_count = len(effective_employees)
-    ineffective_count = len(ineffective_employees)
-
-    effective_store_normalized = effective_store_counts / effective_count
-    ineffective_store_normalized = ineffective_store_counts / ineffective_count
+    group_sizes = aggregates['group_sizes'].reindex([True, False], fill_value=0)
 
     # Объединяем данные в один DataFrame для сравнения
     comparison_df = pd.DataFrame({
-        'Эффективные': effective_store_normalized,
-        'Неэффективные': ineffective_store_normalized
+        'Эффективные': store_counts[True] / group_sizes[True],
+        'Неэффективные': store_counts[False] / group_sizes[False]
     }).fillna(0)
 
     # Сортируем по популярности среди эффективных сотрудников
     comparison_df = comparison_df.sort_values(by='Эффективные', ascending=False)
 
+    if test is not None:
+        # scipy нужен только для проверки значимости, поэтому и FDR_ALPHA берется здесь
+        from matrica import build_purchase_matrix
+        from znachimost import FDR_ALPHA, test_categories
+
+        if alpha is None:
+            alpha = FDR_ALPHA
+
+        matrix, _, categories = build_purchase_matrix(employee_data, purchase_data)
+        tests = test_categories(matrix, categories, employee_data['Эффективность'], test, alpha)
+        comparison_df = comparison_df.join(tests, how='inner').sort_values(['p-value (БХ)', 'p-value'], kind='stable')
+
     return comparison_df
 
-def compare_average_purchases(employee_data, purchase_data):
+def compare_average_purchases(employee_data, purchase_data, aggregates=None):
     """
     Сравнивает среднее количество покупок эффективных и неэффективных сотрудников.
     """
-    effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
-    ineffective_employees = employee_data[employee_data['Эффективность'] == False]['Код сотрудника']
-
-    # Фильтруем покупки, сделанные эффективными и неэффективными сотрудниками
-    effective_purchases = purchase_data[purchase_data['Код сотрудника'].isin(effective_employees)]
-    ineffective_purchases = purchase_data[purchase_data['Код сотрудника'].isin(ineffective_employees)]
-
-    # Считаем количество покупок для каждой группы
-    effective_count = len(effective_purchases)
-    ineffective_count = len(ineffective_purchases)
+    if aggregates is None:
+        aggregates = aggregate_purchases(employee_data, purchase_data)
 
-    # Считаем количество сотрудников в каждой группе
-    num_effective_employees = len(effective_employees)
-    num_ineffective_employees = len(ineffective_employees)
+    # Количество покупок и сотрудников в каждой группе
+    group_purchases = aggregates['group_purchases'].reindex([True, False], fill_value=0)
+    group_sizes = aggregates['group_sizes'].reindex([True, False], fill_value=0)
 
     # Вычисляем среднее количество покупок на сотрудника
-    avg_effective_purchases = effective_count / num_effective_employees if num_effective_employees > 0 else 0
-    avg_ineffective_purchases = ineffective_count / num_ineffective_employees if num_ineffective_employees > 0 else 0
+    avg_effective_purchases = group_purchases[True] / group_sizes[True] if group_sizes[True] > 0 else 0
+    avg_ineffective_purchases = group_purchases[False] / group_sizes[False] if group_sizes[False] > 0 else 0
 
     return avg_effective_purchases, avg_ineffective_purchases
 
@@ -89,6 +98,8 @@ def plot_employee_effectiveness(employee_data):
     """
     Строит график соотношения эффективных и неэффективных сотрудников.
     """
+    import matplotlib.pyplot as plt
+
     effectiveness_counts = employee_data['Эффективность'].value_counts()
 
     plt.figure(figsize=(8, 6))
@@ -98,13 +109,14 @@ def plot_employee_effectiveness(employee_data):
     plt.ylabel('Количество сотрудников')
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.show()
+    show_figure('popularishop_employee_effectiveness')
 
 
 
  
 
 if __name__ == "__main__":
+    setup_logging()
 
     employee_data_path = 'pokupki/tps.csv'  # Замените на актуальный путь
     purchase_data_path = 'pokupki/p.csv'  # Замените на актуальный путь
@@ -114,13 +126,21 @@ if __name__ == "__main__":
         print(category_distribution)
         plot_employee_effectiveness(employee_data)
 
+        # Все счетчики по группам считаются за один проход по покупкам
+        aggregates = aggregate_purchases(employee_data, purchase_data)
+
         # Сравниваем популярность магазинов
-        store_comparison = compare_store_popularity(employee_data, purchase_data)
+        store_comparison = compare_store_popularity(employee_data, purchase_data, aggregates)
         print("\nСравнение популярности магазинов:")
         print(store_comparison)
 
+        # Значимость различий по категориям (Манн-Уитни, поправка Бенджамини-Хохберга)
+        store_tests = compare_store_popularity(employee_data, purchase_data, aggregates, test='mannwhitney')
+        print("\nЗначимость различий по категориям:")
+        print(store_tests)
+
         # Сравниваем среднее количество покупок
-        avg_effective, avg_ineffective = compare_average_purchases(employee_data, purchase_data)
+        avg_effective, avg_ineffective = compare_average_purchases(employee_data, purchase_data, aggregates)
         print(f"\nСреднее количество покупок на эффективного сотрудника: {avg_effective:.2f}")
         print(f"Среднее количество покупок на неэффективного сотрудника: {avg_ineffective:.2f}")
 
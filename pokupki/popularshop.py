@@ -1,12 +1,17 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from grafiki import show_figure
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from zamery import logger, setup_logging, stage
 
 def analyze_purchases(employee_data_path, purchase_data_path):
 
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
-        print(purchase_data.columns)
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
+        logger.debug("Столбцы покупок: %s", list(purchase_data.columns))
+        # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+        employee_data, purchase_data = encode_tables(employee_data, purchase_data)
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
 
@@ -14,14 +19,18 @@ def analyze_purchases(employee_data_path, purchase_data_path):
     # Фильтруем только эффективных сотрудников
     effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
 
-    print("Effective employees:", effective_employees)
-    print("Purchase data head:", purchase_data.head())
+    logger.debug("Effective employees: %d", len(effective_employees))
+    logger.debug("Purchase data head:\n%s", purchase_data.head())
 
-    high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+    with stage('filter', rows=len(purchase_data)) as record:
+        high_productivity_purchases = purchase_data['Код сотрудника'].isin(effective_employees)
+        record['selected'] = int(high_productivity_purchases.sum())
 
-    print("Is high_productivity_purchases empty?", high_productivity_purchases.empty)
+    logger.debug("Is high_productivity_purchases empty? %s", high_productivity_purchases.empty)
 
     category_distribution = purchase_data[high_productivity_purchases]['Категория'].value_counts()
+    # value_counts по Categorical возвращает и категории без покупок
+    category_distribution = category_distribution[category_distribution > 0]
 
     category_distribution_df = pd.DataFrame({'Категория': category_distribution.index, 'count': category_distribution.values})
 
@@ -40,13 +49,14 @@ def plot_employee_effectiveness(employee_data):
     plt.ylabel('Количество сотрудников')
     plt.xticks(rotation=0)
     plt.tight_layout()
-    plt.show()
+    show_figure('popularshop_employee_effectiveness')
 
 
 
  
 
 if __name__ == "__main__":
+    setup_logging()
 
     employee_data_path = 'pokupki/tps.csv'  # Замените на актуальный путь
     purchase_data_path = 'pokupki/p.csv'  # Замените на актуальный путь
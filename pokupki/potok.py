@@ -0,0 +1,47 @@
+import pandas as pd
+from chtenie import block_size_for_rows, iter_csv_quarantined
+from zamery import stage
+
+# Размер порции по умолчанию: несколько сотен тысяч строк держат память в пределах сотен МБ
+DEFAULT_CHUNK_SIZE = 500_000
+
+
+def iter_purchase_chunks(purchase_data_path, chunksize=DEFAULT_CHUNK_SIZE, usecols=('Код сотрудника', 'Категория'),
+                         record=None):
+    """
+    Читает файл покупок порциями примерно по chunksize строк, только нужные столбцы.
+    Битые строки уходят в файл отклоненных строк (chtenie.iter_csv_quarantined),
+    их число записывается в record['rejected'].
+    """
+    return iter_csv_quarantined(purchase_data_path, usecols, sep=';',
+                                block_size=block_size_for_rows(purchase_data_path, chunksize), record=record)
+
+
+def stream_purchase_counts(purchase_data_path, employee_codes, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Потоково считает покупки выбранных сотрудников.
+    Возвращает распределение категорий (как в analyze_purchases) и число покупок
+    на каждого сотрудника из employee_codes, включая сотрудников без покупок.
+    Памяти нужно на одну порцию и на итоговые счетчики, а не на весь файл.
+    """
+    employee_codes = pd.Index(pd.unique(pd.Series(employee_codes)))
+    category_counts = pd.Series(dtype='int64')
+    employee_counts = pd.Series(dtype='int64')
+
+    with stage('load', path=purchase_data_path, streaming=True) as record:
+        record['rows'] = 0
+        for chunk in iter_purchase_chunks(purchase_data_path, chunksize, record=record):
+            record['rows'] += len(chunk)
+            chunk = chunk[chunk['Код сотрудника'].isin(employee_codes)]
+            if chunk.empty:
+                continue
+            category_counts = category_counts.add(chunk['Категория'].value_counts(), fill_value=0)
+            employee_counts = employee_counts.add(chunk['Код сотрудника'].value_counts(), fill_value=0)
+
+    category_counts = category_counts.astype('int64').sort_values(ascending=False, kind='stable')
+    category_distribution_df = pd.DataFrame({'Категория': category_counts.index, 'count': category_counts.values})
+
+    # Заполнение нулями для сотрудников без покупок
+    employee_counts = employee_counts.reindex(employee_codes, fill_value=0).astype('int64')
+
+    return category_distribution_df, employee_counts
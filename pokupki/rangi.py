@@ -0,0 +1,129 @@
+import numpy as np
+from scipy import stats
+
+# Для целых неотрицательных данных не больше этого значения ранги считаются по гистограммам
+MAX_HISTOGRAM_VALUE = 4096
+
+# При выборке не больше этого размера без связей scipy (method='auto') считает точный
+# p-value Манна-Уитни; тогда расчет передается scipy
+MAX_EXACT_SIZE = 8
+
+
+def histogram_max_value(values):
+    """Возвращает максимум, если по значениям можно строить гистограммы, иначе None"""
+    values = np.asarray(values)
+    if values.size == 0 or values.min() < 0 or values.max() > MAX_HISTOGRAM_VALUE:
+        return None
+    if not np.array_equal(values, np.round(values)):
+        return None
+    return int(values.max())
+
+
+def row_histograms(samples, width):
+    """Гистограммы всех строк матрицы небольших целых чисел одним вызовом bincount"""
+    samples = np.asarray(samples, dtype=np.int64)
+    n_rows = samples.shape[0]
+    offsets = (np.arange(n_rows) * width)[:, np.newaxis]
+    return np.bincount((samples + offsets).ravel(), minlength=n_rows * width).reshape(n_rows, width)
+
+
+def _rank_sums(histograms):
+    """
+    Суммы рангов групп и поправка на связи по гистограммам (..., группы, значения).
+    Все наблюдения с одним значением - один блок связанных рангов со средним рангом
+    блока, поэтому ранги считаются за O(число значений), без сортировки наблюдений.
+    Возвращает суммы рангов (..., группы), размеры групп и сумму t^3 - t по блокам связей.
+    """
+    ties = histograms.sum(axis=-2).astype(float)
+    before = np.cumsum(ties, axis=-1) - ties
+    midrank = before + (ties + 1) / 2
+    rank_sums = (histograms * midrank[..., np.newaxis, :]).sum(axis=-1)
+    sizes = histograms.sum(axis=-1).astype(float)
+    tie_term = (ties ** 3 - ties).sum(axis=-1)
+    return rank_sums, sizes, tie_term
+
+
+def mannwhitney_histograms(histograms1, histograms2, use_continuity=True):
+    """
+    Двусторонний тест Манна-Уитни по гистограммам значений двух групп (..., значения):
+    нормальное приближение с поправкой на связи, как scipy.stats.mannwhitneyu(method='asymptotic').
+    Первые оси - пакет сравнений (подвыборки, страты), все они считаются одним расчетом.
+    Возвращает статистику U первой группы и p-value.
+    """
+    histograms = np.stack(np.broadcast_arrays(histograms1, histograms2), axis=-2)
+    rank_sums, sizes, tie_term = _rank_sums(histograms)
+    n1, n2 = sizes[..., 0], sizes[..., 1]
+    n = n1 + n2
+    u1 = rank_sums[..., 0] - n1 * (n1 + 1) / 2
+
+    mu = n1 * n2 / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (np.maximum(u1, n1 * n2 - u1) - mu - 0.5 * use_continuity) / sigma
+    p_values = np.clip(2 * stats.norm.sf(z), 0, 1)
+    return u1, p_values
+
+
+def kruskal_histograms(histograms):
+    """
+    Тест Краскела-Уоллиса по гистограммам значений групп (..., группы, значения)
+    с поправкой на связи, как scipy.stats.kruskal. Если все значения одинаковы,
+    статистика и p-value - nan (scipy в этом случае выдает ошибку).
+    Возвращает статистику H и p-value.
+    """
+    rank_sums, sizes, tie_term = _rank_sums(histograms)
+    n = sizes.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h = 12 / (n * (n + 1)) * (rank_sums ** 2 / sizes).sum(axis=-1) - 3 * (n + 1)
+        h = h / (1 - tie_term / (n ** 3 - n))
+    # Все значения одинаковы (один блок связей): из-за округления числитель
+    # может быть не ровно нулем, и вместо nan получилось бы -inf или inf
+    h = np.where(tie_term == n ** 3 - n, np.nan, h)[()]
+    p_values = stats.chi2.sf(h, histograms.shape[-2] - 1)
+    return h, p_values
+
+
+def _batch_histograms(samples, width):
+    """Гистограммы одной выборки (одномерный массив) или пакета выборок (строки матрицы)"""
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        return np.bincount(samples.astype(np.int64), minlength=width)
+    return row_histograms(samples, width)
+
+
+def mannwhitneyu(x, y, method='asymptotic'):
+    """
+    Замена scipy.stats.mannwhitneyu(x, y, axis=-1) для счетчиков покупок.
+    x и y - выборки или матрицы выборок (строка - одно сравнение). Для небольших целых
+    неотрицательных значений тест считается по гистограммам, иначе - через scipy.
+    method='auto' повторяет выбор scipy: для малых выборок без связей - точный тест scipy.
+    """
+    max_x, max_y = histogram_max_value(x), histogram_max_value(y)
+    if max_x is None or max_y is None:
+        return stats.mannwhitneyu(x, y, axis=-1, method=method)
+
+    width = max(max_x, max_y) + 1
+    histograms1 = _batch_histograms(x, width)
+    histograms2 = _batch_histograms(y, width)
+    if method == 'auto':
+        small = min(np.shape(x)[-1], np.shape(y)[-1]) <= MAX_EXACT_SIZE
+        if small and not ((histograms1 + histograms2) > 1).any():
+            return stats.mannwhitneyu(x, y, axis=-1, method='auto')
+    elif method != 'asymptotic':
+        return stats.mannwhitneyu(x, y, axis=-1, method=method)
+    return mannwhitney_histograms(histograms1, histograms2)
+
+
+def kruskal(*samples):
+    """
+    Замена scipy.stats.kruskal(*samples, axis=-1) для счетчиков покупок: по гистограммам
+    для небольших целых неотрицательных значений, иначе через scipy.
+    Каждая выборка - одномерный массив или матрица выборок (строка - одно сравнение).
+    """
+    max_values = [histogram_max_value(sample) for sample in samples]
+    if any(value is None for value in max_values):
+        return stats.kruskal(*samples, axis=-1)
+
+    width = max(max_values) + 1
+    histograms = np.stack(np.broadcast_arrays(*(_batch_histograms(sample, width) for sample in samples)), axis=-2)
+    return kruskal_histograms(histograms)
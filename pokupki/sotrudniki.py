@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+from missii import KEY_MISSIONS, flag_columns, match_key_missions
+
+# Границы важности миссии по сумме вознаграждения: 1-30 - не важная, до 250 - полезная, выше - очень полезная
+IMPORTANCE_BINS = [0, 30, 250, float('inf')]
+IMPORTANCE_COLUMNS = ['Не важные миссии', 'Полезные миссии', 'Очень полезные миссии']
+
+EMPLOYEE_INFO_COLUMNS = [
+    'Факт. департамент',
+    'Факт. подразделение',
+    'Факт. группа',
+    'Факт. должность',
+    'Является РМ/ТЛ',
+    'Стаж фактический по компании',
+    'Пол',
+    'Возраст'
+]
+
+# Журнал миссий читается блоками примерно такого размера (по границам строк)
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+
+STATE_DIR_NAME = '.cache'
+
+# По отпечатку начала журнала определяется, что файл перезаписан, а не дописан
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def count_missions(mission_rows, key_missions=KEY_MISSIONS):
+    """
+    Считает счетчики по строкам журнала миссий: число миссий каждой важности
+    и флаги выполнения ключевых миссий для каждого сотрудника из журнала.
+    """
+    mission_rows = mission_rows[mission_rows['Код сотрудника'].notna()]
+    reward = pd.to_numeric(mission_rows['Сумма вознаграждения'], errors='coerce')
+    importance = pd.cut(reward, bins=IMPORTANCE_BINS, labels=IMPORTANCE_COLUMNS, right=True)
+
+    # Как pivot_table(aggfunc='count') в блокноте: считаются строки с названием миссии
+    counted = mission_rows['Название миссии'].notna() & importance.notna()
+    task_counts = pd.crosstab(mission_rows['Код сотрудника'][counted], importance[counted])
+
+    # Каждое уникальное название миссии проверяется один раз
+    flags = match_key_missions(mission_rows['Название миссии'], key_missions)[flag_columns(key_missions)]
+    key_mission_stats = flags.groupby(mission_rows['Код сотрудника']).any()
+
+    counters = key_mission_stats.join(task_counts.reindex(columns=IMPORTANCE_COLUMNS, fill_value=0))
+    counters[IMPORTANCE_COLUMNS] = counters[IMPORTANCE_COLUMNS].fillna(0).astype('int64')
+    return counters[IMPORTANCE_COLUMNS + flag_columns(key_missions)]
+
+
+def merge_counters(counters, new_counters):
+    """Добавляет новые счетчики к накопленным: количества складываются, флаги объединяются по ИЛИ"""
+    if counters is None:
+        return new_counters
+    combined = pd.concat([counters, new_counters])
+    grouped = combined.groupby(level=0, sort=True)
+    flags = [column for column in combined.columns if column not in IMPORTANCE_COLUMNS]
+    return grouped[IMPORTANCE_COLUMNS].sum().join(grouped[flags].any())
+
+
+def build_employee_stats(counters, employee_list, key_missions=KEY_MISSIONS):
+    """
+    Собирает таблицу сотрудников (как tps.csv) из накопленных счетчиков и списка сотрудников:
+    присоединяет сведения о сотруднике и пересчитывает производные столбцы.
+    """
+    employee_info = (employee_list.rename(columns={'Внешний код': 'Код сотрудника'})
+                     .drop_duplicates('Код сотрудника')
+                     .set_index('Код сотрудника')[EMPLOYEE_INFO_COLUMNS])
+
+    employee_stats = counters.sort_index().join(employee_info, how='left')
+    employee_stats.index.name = 'Код сотрудника'
+    employee_stats.fillna({
+        'Факт. подразделение': 'Не указано',
+        'Факт. группа': 'Не указано'
+    }, inplace=True)
+    employee_stats.reset_index(inplace=True)
+
+    employee_stats['Является РМ/ТЛ'] = employee_stats['Является РМ/ТЛ'].astype(bool)
+    for column in flag_columns(key_missions):
+        employee_stats[column] = employee_stats[column].astype(bool)
+
+    # Удаляем пропуски
+    employee_stats = employee_stats.dropna().reset_index(drop=True)
+
+    # Эффективен сотрудник, выполнивший хотя бы одну ключевую миссию
+    employee_stats['Эффективность'] = employee_stats[flag_columns(key_missions)].any(axis=1)
+
+    employee_stats['Всего миссий'] = employee_stats[IMPORTANCE_COLUMNS].sum(axis=1)
+    srednee_missiy = employee_stats['Всего миссий'].sum() / len(employee_stats)
+    employee_stats['Среднее миссий на сотрудника'] = srednee_missiy
+
+    employee_stats['Продуктивность сотрудника'] = (
+        (employee_stats['Полезные миссии'] / srednee_missiy) +
+        (employee_stats['Очень полезные миссии'] / srednee_missiy) * 1.1
+    ).round(2)
+
+    return employee_stats
+
+
+def load_employee_list(employee_list_path):
+    """Загружает список сотрудников (xlsx или csv)"""
+    if employee_list_path.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(employee_list_path)
+    return pd.read_csv(employee_list_path)
+
+
+def _state_paths(mission_log_path):
+    """Пути к накопленным счетчикам и к их описанию (смещение в журнале, заголовок, ключевые миссии)"""
+    directory, name = os.path.split(os.path.abspath(mission_log_path))
+    base = os.path.splitext(name)[0]
+    state_dir = os.path.join(directory, STATE_DIR_NAME)
+    return (os.path.join(state_dir, f'{base}-counters.feather'),
+            os.path.join(state_dir, f'{base}-counters.json'))
+
+
+def _fingerprint(log_file, offset):
+    """Хэш первых байтов журнала (не дальше уже обработанного смещения)"""
+    log_file.seek(0)
+    return hashlib.sha1(log_file.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+
+def _read_header(log_file, encoding):
+    """Читает строку заголовка журнала и возвращает названия столбцов"""
+    header_line = log_file.readline()
+    if encoding.replace('-', '').lower() == 'utf8':
+        encoding = 'utf-8-sig'
+    return list(pd.read_csv(io.BytesIO(header_line), sep=';', encoding=encoding, nrows=0).columns)
+
+
+def _iter_new_blocks(log_file, start, block_bytes):
+    """
+    Возвращает блоки байтов журнала от смещения start до последнего полного перевода строки.
+    Незаконченная последняя строка остается на следующий запуск.
+    """
+    log_file.seek(start)
+    remainder = b''
+    while True:
+        data = log_file.read(block_bytes)
+        if not data:
+            break
+        data = remainder + data
+        cut = data.rfind(b'\n') + 1
+        remainder = data[cut:]
+        if cut:
+            yield data[:cut]
+
+
+def update_employee_counters(mission_log_path, key_missions=KEY_MISSIONS, encoding='utf-8',
+                             block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Применяет к сохраненным счетчикам только строки, дописанные в журнал миссий
+    после прошлого запуска, и сохраняет счетчики обратно.
+    Если журнал укоротился или перезаписан, сменился его заголовок или список ключевых миссий,
+    счетчики пересчитываются по всему журналу.
+    Журнал читается блоками по границам строк, поэтому переводы строк внутри
+    полей в кавычках не поддерживаются.
+    """
+    counters_path, meta_path = _state_paths(mission_log_path)
+
+    with open(mission_log_path, 'rb') as log_file:
+        header = _read_header(log_file, encoding)
+        data_start = log_file.tell()
+        log_size = os.fstat(log_file.fileno()).st_size
+
+        counters = None
+        offset = data_start
+        if os.path.exists(counters_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if (meta['header'] == header and meta['key_missions'] == list(key_missions)
+                    and data_start <= meta['offset'] <= log_size
+                    and meta['fingerprint'] == _fingerprint(log_file, meta['offset'])):
+                counters = pd.read_feather(counters_path).set_index('Код сотрудника')
+                offset = meta['offset']
+
+        for block in _iter_new_blocks(log_file, offset, block_bytes):
+            rows = pd.read_csv(io.BytesIO(block), sep=';', header=None, names=header, encoding=encoding)
+            counters = merge_counters(counters, count_missions(rows, key_missions))
+            offset += len(block)
+
+        fingerprint = _fingerprint(log_file, offset)
+
+    if counters is None:
+        counters = count_missions(pd.DataFrame(columns=header), key_missions)
+
+    os.makedirs(os.path.dirname(counters_path), exist_ok=True)
+    counters.rename_axis('Код сотрудника').reset_index().to_feather(counters_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'offset': offset, 'header': header, 'key_missions': list(key_missions),
+                   'fingerprint': fingerprint}, f, ensure_ascii=False)
+
+    return counters
+
+
+def update_employee_stats(mission_log_path, employee_list_path, key_missions=KEY_MISSIONS, encoding='utf-8'):
+    """Обновляет счетчики по новым строкам журнала миссий и собирает таблицу сотрудников"""
+    counters = update_employee_counters(mission_log_path, key_missions, encoding)
+    return build_employee_stats(counters, load_employee_list(employee_list_path), key_missions)
+
+
+if __name__ == "__main__":
+    # Пути к файлам данных
+    mission_log_path = 'NEW Как зарабатывают бобров КРОК (1).csv'
+    employee_list_path = 'Список сотрудников КРОК.xlsx'
+    employee_stats_path = 'pokupki/tps.csv'
+
+    try:
+        employee_stats = update_employee_stats(mission_log_path, employee_list_path)
+        employee_stats.to_csv(employee_stats_path, index=False, encoding='utf-8-sig')
+        print(f"Сотрудников: {len(employee_stats)}, эффективных: {employee_stats['Эффективность'].sum()}")
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
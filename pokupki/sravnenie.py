@@ -1,15 +1,20 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import stats
 import numpy as np
-from statsmodels.stats.power import TTestIndPower
+from grafiki import render_figures, show_figure
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from agregacia import aggregate_purchases, group_employee_counts
+from perestanovki import permutation_test
+from statistika import compare_groups_cached
+
+# Число перестановок для перестановочного теста (0 - не проводить)
+N_PERMUTATIONS = 0
 
 def analyze_purchases(employee_data_path, purchase_data_path):
     """Загружает и анализирует данные о сотрудниках и покупках"""
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
         
         # Проверка необходимых столбцов
         required_employee_cols = {'Код сотрудника', 'Эффективность'}
@@ -23,7 +28,8 @@ def analyze_purchases(employee_data_path, purchase_data_path):
             missing = required_purchase_cols - set(purchase_data.columns)
             raise KeyError(f"В данных покупок отсутствуют столбцы: {missing}")
 
-        return employee_data, purchase_data
+        # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+        return encode_tables(employee_data, purchase_data)
 
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
@@ -49,7 +55,7 @@ def plot_employee_effectiveness(employee_data):
                           textcoords='offset points')
     
     plt.tight_layout()
-    plt.show()
+    show_figure('sravnenie_employee_effectiveness')
 
 def plot_purchase_comparison(effective_counts, ineffective_counts):
     """Визуализирует сравнение покупок между группами"""
@@ -73,17 +79,20 @@ def plot_purchase_comparison(effective_counts, ineffective_counts):
     plt.legend()
     
     plt.tight_layout()
-    plt.show()
+    show_figure('sravnenie_purchase_comparison')
 
-def perform_statistical_analysis(effective_counts, ineffective_counts):
-    """Выполняет статистический анализ"""
+def perform_statistical_analysis(effective_counts, ineffective_counts, n_permutations=0):
+    """Выполняет статистический анализ, печатает и возвращает результаты тестов (GroupComparison)"""
     print("\n" + "="*50)
     print("Статистический анализ различий между группами")
     print("="*50)
-    
+
+    # Все тесты считаются одним вызовом; для тех же счетчиков результат берется из базы результатов
+    result = compare_groups_cached(effective_counts, ineffective_counts)
+    p_normal_effective = result.p_shapiro_effective
+    p_normal_ineffective = result.p_shapiro_ineffective
+
     # Проверка нормальности распределения
-    _, p_normal_effective = stats.shapiro(effective_counts)
-    _, p_normal_ineffective = stats.shapiro(ineffective_counts)
     print(f"\nТест Шапиро-Уилка на нормальность:")
     print(f"Эффективные сотрудники: p-value = {p_normal_effective:.4f}")
     print(f"Неэффективные сотрудники: p-value = {p_normal_ineffective:.4f}")
@@ -91,15 +100,14 @@ def perform_statistical_analysis(effective_counts, ineffective_counts):
     # Выбор теста в зависимости от нормальности распределения
     if p_normal_effective > 0.05 and p_normal_ineffective > 0.05:
         print("\nДанные распределены нормально, используем t-тест")
-        stat, p_value = stats.ttest_ind(effective_counts, ineffective_counts)
-        test_name = "t-тест"
     elif len(effective_counts) < 2 or len(ineffective_counts) < 2:
         print("\nНедостаточно данных для проведения теста Манна-Уитни")
-        stat, p_value = np.nan, np.nan
-        test_name = "Нет теста"
+    else:
+        print("\nДанные не распределены нормально, используем тест Краскела-Уоллиса")
+    stat, p_value, test_name = result.statistic, result.p_value, result.test_name
     
     # Mann-Whitney test
-    stat_mann, p_value_mann = stats.mannwhitneyu(effective_counts, ineffective_counts)
+    stat_mann, p_value_mann = result.mann_whitney_statistic, result.mann_whitney_p_value
     test_name_mann = "Тест Манна-Уитни"
     print(f"\nРезультаты {test_name_mann}:")
     print(f"Статистика: {stat_mann:.3f}, p-value: {p_value_mann:.4f}")
@@ -119,14 +127,17 @@ def perform_statistical_analysis(effective_counts, ineffective_counts):
         print("\nВывод: Невозможно сделать вывод из-за недостатка данных.")
     
     # Анализ мощности теста
-    effect_size = (np.mean(effective_counts) - np.mean(ineffective_counts)) / np.std(np.concatenate([effective_counts, ineffective_counts]))
-    power = TTestIndPower().solve_power(effect_size=effect_size, 
-                                      nobs1=len(effective_counts), 
-                                      alpha=0.05)
     print(f"\nАнализ мощности теста:")
-    print(f"Размер эффекта: {effect_size:.3f}")
-    print(f"Мощность теста: {power:.3f}")
+    print(f"Размер эффекта: {result.effect_size:.3f}")
+    print(f"Мощность теста: {result.power:.3f}")
+
+    # Перестановочный тест: не требует нормальности, подходит для счетчиков с большим числом нулей
+    if n_permutations > 0:
+        permutation_results = permutation_test(effective_counts, ineffective_counts, n_permutations)
+        print(f"\nПерестановочный тест ({permutation_results['Перестановок'].iloc[0]} перестановок):")
+        print(permutation_results.to_string())
 
+    return result
 
 
 if __name__ == "__main__":
@@ -138,23 +149,22 @@ if __name__ == "__main__":
         # Загрузка данных
         employee_data, purchase_data = analyze_purchases(employee_data_path, purchase_data_path)
         
-        # Визуализация распределения эффективности
-        plot_employee_effectiveness(employee_data)
-        
         # Разделение сотрудников на группы
         effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
         ineffective_employees = employee_data[employee_data['Эффективность'] == False]['Код сотрудника']
         
-        # Подсчет количества покупок для каждого сотрудника
-        effective_counts = purchase_data[purchase_data['Код сотрудника'].isin(effective_employees)]['Код сотрудника'].value_counts()
-        ineffective_counts = purchase_data[purchase_data['Код сотрудника'].isin(ineffective_employees)]['Код сотрудника'].value_counts()
-        
-        # Заполнение нулями для сотрудников без покупок
-        all_effective = pd.Series(0, index=effective_employees)
-        all_ineffective = pd.Series(0, index=ineffective_employees)
-        
-        effective_counts = all_effective.add(effective_counts, fill_value=0).values
-        ineffective_counts = all_ineffective.add(ineffective_counts, fill_value=0).values
+        # Подсчет количества покупок для каждого сотрудника за один проход,
+        # сотрудники без покупок получают нули
+        aggregates = aggregate_purchases(employee_data, purchase_data)
+        effective_counts = group_employee_counts(aggregates, True)
+        ineffective_counts = group_employee_counts(aggregates, False)
+
+        # Визуализация: распределение эффективности и сравнение покупок
+        # (в пакетном режиме графики строятся параллельно)
+        render_figures([
+            (plot_employee_effectiveness, (employee_data,)),
+            (plot_purchase_comparison, (effective_counts, ineffective_counts)),
+        ])
         
         # Основные метрики
         print("\nОсновные метрики:")
@@ -167,10 +177,7 @@ if __name__ == "__main__":
         print(f"Медиана: {np.median(ineffective_counts):.2f}")
         
         # Статистический анализ
-        perform_statistical_analysis(effective_counts, ineffective_counts)
-
-        # Визуализация сравнения покупок
-        plot_purchase_comparison(effective_counts, ineffective_counts)
+        perform_statistical_analysis(effective_counts, ineffective_counts, N_PERMUTATIONS)
 
     except Exception as e:
         print(f"Ошибка при выполнении программы: {str(e)}")
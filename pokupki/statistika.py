@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+import rangi
+from kesh import cached_call
+from moshchnost import ttest_power
+from zamery import stage
+
+# Уровень значимости тестов и анализа мощности
+ALPHA = 0.05
+
+# Версия расчета входит в ключ результата: меняется вместе с формулами,
+# чтобы старые результаты в базе не использовались
+RESULTS_VERSION = 2
+
+# Результат сравнения эффективных и неэффективных сотрудников
+GroupComparison = namedtuple('GroupComparison', [
+    'n_effective',
+    'n_ineffective',
+    'p_shapiro_effective',
+    'p_shapiro_ineffective',
+    'test_name',
+    'statistic',
+    'p_value',
+    'effect_size',
+    'power',
+    'mann_whitney_statistic',
+    'mann_whitney_p_value',
+])
+
+
+def compare_group_counts(effective_counts, ineffective_counts, alpha=ALPHA):
+    """
+    Тесты perform_statistical_analysis без вывода на экран: Шапиро-Уилк, t-тест или
+    Краскел-Уоллис, размер эффекта и мощность, Манн-Уитни.
+    Возвращает словарь с полями GroupComparison.
+    """
+    _, p_normal_effective = stats.shapiro(effective_counts)
+    _, p_normal_ineffective = stats.shapiro(ineffective_counts)
+
+    # Выбор теста в зависимости от нормальности распределения
+    if p_normal_effective > alpha and p_normal_ineffective > alpha:
+        stat, p_value = stats.ttest_ind(effective_counts, ineffective_counts)
+        test_name = "t-тест"
+    elif len(effective_counts) < 2 or len(ineffective_counts) < 2:
+        stat, p_value = np.nan, np.nan
+        test_name = "Нет теста"
+    else:
+        stat, p_value = rangi.kruskal(effective_counts, ineffective_counts)
+        test_name = "Тест Краскела-Уоллиса"
+
+    # Анализ мощности теста с учетом разного размера групп
+    effect_size = (np.mean(effective_counts) - np.mean(ineffective_counts)) / np.std(np.concatenate([effective_counts, ineffective_counts]))
+    power = ttest_power(effect_size, len(effective_counts), len(ineffective_counts) / len(effective_counts), alpha)
+
+    stat_mann, p_value_mann = rangi.mannwhitneyu(effective_counts, ineffective_counts, method='auto')
+
+    return {
+        'n_effective': len(effective_counts),
+        'n_ineffective': len(ineffective_counts),
+        'p_shapiro_effective': float(p_normal_effective),
+        'p_shapiro_ineffective': float(p_normal_ineffective),
+        'test_name': test_name,
+        'statistic': float(stat),
+        'p_value': float(p_value),
+        'effect_size': float(effect_size),
+        'power': float(power),
+        'mann_whitney_statistic': float(stat_mann),
+        'mann_whitney_p_value': float(p_value_mann),
+    }
+
+
+def compare_groups_cached(effective_counts, ineffective_counts, alpha=ALPHA):
+    """
+    То же, что compare_group_counts, но через базу результатов (kesh): при тех же массивах
+    счетчиков и параметрах тесты не пересчитываются. Возвращает GroupComparison.
+    Результаты тестов не зависят от порядка сотрудников, поэтому массивы сортируются:
+    перемешанная выборка из тех же счетчиков находит тот же результат.
+    """
+    with stage('test', rows=len(effective_counts) + len(ineffective_counts)):
+        result = cached_call(f'compare_group_counts/{RESULTS_VERSION}', compare_group_counts,
+                             [np.sort(effective_counts), np.sort(ineffective_counts)], {'alpha': alpha})
+    return GroupComparison(**result)
@@ -0,0 +1,70 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Столбец со стажем в выгрузке сотрудников (tps.csv, ssk.csv), например "6 г., 6 мес.,7 дн."
+TENURE_COLUMN = 'Стаж фактический по компании'
+
+# Столбцы, которые добавляет add_tenure
+TENURE_DAYS_COLUMN = 'Стаж, дней'
+TENURE_BAND_COLUMN = 'Группа стажа'
+
+# Годы, месяцы и дни; любая часть может отсутствовать, пробелы вокруг запятых необязательны
+TENURE_PATTERN = re.compile(r'^\s*(?:(\d+)\s*г\.?)?\s*,?\s*(?:(\d+)\s*мес\.?)?\s*,?\s*(?:(\d+)\s*дн\.?)?\s*$')
+
+# Перевод лет и месяцев в дни (средняя длина года и месяца)
+DAYS_PER_YEAR = 365.25
+DAYS_PER_MONTH = DAYS_PER_YEAR / 12
+
+# Границы групп стажа в годах (левая граница входит в группу)
+TENURE_BINS = [0, 1, 3, 5, 10, float('inf')]
+TENURE_LABELS = ['до 1 года', '1-3 года', '3-5 лет', '5-10 лет', 'больше 10 лет']
+
+# Уже разобранные строки стажа: строка -> число дней (pd.NA, если строка не разобрана)
+_PARSED = {}
+
+
+def _parse_unique(values):
+    """Разбирает массив различных строк стажа одним векторным проходом регулярного выражения"""
+    parts = pd.Series(values, dtype=str).str.extract(TENURE_PATTERN)
+    parts = parts.apply(pd.to_numeric)
+    # Строка без единой части (пустая или в другом формате) не разобрана
+    matched = parts.notna().any(axis=1).to_numpy()
+    years, months, days = (parts[column].fillna(0).to_numpy() for column in parts.columns)
+    total = np.round(years * DAYS_PER_YEAR + months * DAYS_PER_MONTH + days)
+    return np.where(matched, total, np.nan)
+
+
+def parse_tenure(values):
+    """
+    Переводит строки стажа ("6 г., 6 мес.,7 дн.") в число дней (Int32, нераспознанные - <NA>).
+    Одинаковый стаж у многих сотрудников, поэтому разбирается только каждая различная строка,
+    и результат запоминается между вызовами (таблицы tps.csv и ssk.csv разбираются один раз).
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    uniques = uniques.astype(str)
+
+    new = [value for value in uniques if value not in _PARSED]
+    if new:
+        _PARSED.update(zip(new, _parse_unique(new)))
+
+    unique_days = np.array([_PARSED[value] for value in uniques], dtype=float)
+    # Код -1 у пропусков; дополнительный элемент nan в конце массива
+    days = np.append(unique_days, np.nan)[codes]
+    return pd.Series(days, index=values.index, name=TENURE_DAYS_COLUMN).astype('Int32')
+
+
+def add_tenure(employee_data, bins=TENURE_BINS, labels=TENURE_LABELS, column=TENURE_COLUMN):
+    """
+    Добавляет столбцы 'Стаж, дней' (числовой, попадает в корреляции и сравнения)
+    и 'Группа стажа' по границам bins в годах (для разбиения на страты).
+    """
+    employee_data = employee_data.copy(deep=False)
+    days = parse_tenure(employee_data[column])
+    employee_data[TENURE_DAYS_COLUMN] = days
+    # Границы переводятся в дни так же, как годы стажа: ровно 1 г. попадает в группу '1-3 года'
+    day_bins = np.round(np.asarray(bins, dtype=float) * DAYS_PER_YEAR)
+    employee_data[TENURE_BAND_COLUMN] = pd.cut(days.astype(float), bins=day_bins, labels=labels, right=False)
+    return employee_data
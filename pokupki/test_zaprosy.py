@@ -0,0 +1,89 @@
+# Сверка SQL-расчета (zaprosy, DuckDB) с pandas-расчетом на небольших наборах данных:
+#   python -m pytest pokupki/test_zaprosy.py
+# Наборы строятся во временном каталоге, так что файлы tps.csv и p.csv не нужны.
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+
+import zaprosy
+from agregacia import aggregate_purchases
+from dano import analyze_purchases
+from popularishop import compare_average_purchases, compare_store_popularity
+from zagruzka import encode_tables, load_employee_data, load_purchase_data
+
+# Наборы данных: число сотрудников, покупок и категорий
+DATASETS = {
+    # Пропущенные категории (пустые и 'NA'), покупки неизвестных сотрудников,
+    # сотрудники без покупок и без оценки эффективности
+    'propuski': {'employees': 50, 'purchases': 400, 'categories': 5, 'missing': True},
+    # Больше 64 категорий и много равных счетчиков: проверка порядка при равенстве
+    'mnogo_kategoriy': {'employees': 300, 'purchases': 5000, 'categories': 100, 'missing': False},
+}
+
+
+def _write_dataset(directory, employees, purchases, categories, missing, seed=0):
+    """Пишет tps.csv и p.csv в каталог и возвращает пути к ним"""
+    rng = np.random.default_rng(seed)
+    codes = [f'SU{i:05d}' for i in range(employees)]
+    effectiveness = rng.random(employees) < 0.4
+    employee_data = pd.DataFrame({
+        'Код сотрудника': codes,
+        'Эффективность': pd.Series(effectiveness, dtype=object),
+        'Продуктивность сотрудника': rng.integers(0, 20, employees) / 20,
+    })
+    if missing:
+        employee_data.loc[:2, 'Эффективность'] = None
+
+    category_names = [f'Кат{i:03d}' for i in range(categories)]
+    buyers = codes[:-5] + ['XX-неизвестный-1', 'XX-неизвестный-2'] if missing else codes
+    purchase_data = pd.DataFrame({
+        'Дата': '2024-01-01',
+        'Код сотрудника': rng.choice(buyers, purchases),
+        'Категория': rng.choice(category_names + (['', 'NA'] if missing else []), purchases),
+        'Сумма': 100,
+    })
+
+    employee_data_path = directory / 'tps.csv'
+    purchase_data_path = directory / 'p.csv'
+    employee_data.to_csv(employee_data_path, index=False)
+    purchase_data.to_csv(purchase_data_path, sep=';', index=False)
+    return str(employee_data_path), str(purchase_data_path)
+
+
+@pytest.fixture(params=list(DATASETS))
+def dataset(request, tmp_path):
+    """Пути к набору данных, таблицы pandas-пути и соединение DuckDB"""
+    employee_data_path, purchase_data_path = _write_dataset(tmp_path, **DATASETS[request.param])
+    employee_data, purchase_data = encode_tables(load_employee_data(employee_data_path),
+                                                 load_purchase_data(purchase_data_path))
+    return {
+        'paths': (employee_data_path, purchase_data_path),
+        'employee_data': employee_data,
+        'purchase_data': purchase_data,
+        'connection': zaprosy.connect(purchase_data_path),
+    }
+
+
+def test_store_popularity(dataset):
+    expected = compare_store_popularity(dataset['employee_data'], dataset['purchase_data'],
+                                        aggregate_purchases(dataset['employee_data'], dataset['purchase_data']))
+    aggregates = zaprosy.purchase_aggregates(*dataset['paths'], connection=dataset['connection'])
+    pd.testing.assert_frame_equal(compare_store_popularity(None, None, aggregates), expected, check_exact=True)
+
+
+def test_average_purchases(dataset):
+    expected = compare_average_purchases(dataset['employee_data'], dataset['purchase_data'])
+    aggregates = zaprosy.purchase_aggregates(*dataset['paths'], connection=dataset['connection'])
+    assert compare_average_purchases(None, None, aggregates) == expected
+
+
+def test_category_distribution(dataset):
+    expected = analyze_purchases(*dataset['paths'])
+    actual = zaprosy.category_distribution(*dataset['paths'], connection=dataset['connection'])
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+
+def test_check_parity(dataset):
+    assert zaprosy.check_parity(*dataset['paths']) == []
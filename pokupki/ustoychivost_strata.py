@@ -0,0 +1,164 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from agregacia import aggregate_purchases
+from moshchnost import ttest_power
+from statistika import compare_group_counts
+from stazh import TENURE_BAND_COLUMN, add_tenure
+
+# Столбцы tps.csv, по которым сотрудники делятся на страты
+# (также 'Возрастная группа' и 'Группа стажа' - добавляются по возрасту и стажу)
+STRATA_COLUMNS = ['Пол']
+
+# Границы возрастных групп для столбца 'Возрастная группа'
+AGE_BINS = [0, 25, 35, 45, 55, float('inf')]
+AGE_LABELS = ['до 25', '26-35', '36-45', '46-55', 'старше 55']
+
+# Страты, где в одной из групп меньше сотрудников, не сравниваются
+MIN_GROUP_SIZE = 3
+
+# Названия полей statistika.compare_group_counts в таблице результатов
+RESULT_COLUMNS = {
+    'p_shapiro_effective': 'p-value Шапиро (эффективные)',
+    'p_shapiro_ineffective': 'p-value Шапиро (неэффективные)',
+    'test_name': 'Тест',
+    'statistic': 'Статистика',
+    'p_value': 'p-value',
+    'mann_whitney_statistic': 'Статистика Манна-Уитни',
+    'mann_whitney_p_value': 'p-value Манна-Уитни',
+    'effect_size': 'Размер эффекта',
+    'power': 'Мощность теста',
+}
+
+# Сетка размеров эффекта для кривых мощности по стратам
+POWER_EFFECT_SIZES = [0.1, 0.2, 0.3, 0.5, 0.8]
+
+# Число процессов для расчета страт (None - по числу ядер, 1 - без пула процессов)
+N_JOBS = None
+
+
+def add_age_bands(employee_data, bins=AGE_BINS, labels=AGE_LABELS):
+    """Добавляет столбец 'Возрастная группа' по столбцу 'Возраст'"""
+    employee_data = employee_data.copy(deep=False)
+    employee_data['Возрастная группа'] = pd.cut(employee_data['Возраст'], bins=bins, labels=labels, right=True)
+    return employee_data
+
+
+def compare_groups(effective_counts, ineffective_counts):
+    """
+    Сравнивает покупки эффективных и неэффективных сотрудников тестами
+    statistika.compare_group_counts и добавляет средние и медианы групп.
+    Возвращает словарь с русскими названиями полей (столбцы таблицы результатов).
+    """
+    result = {
+        'Эффективных': len(effective_counts),
+        'Неэффективных': len(ineffective_counts),
+        'Среднее эффективных': np.mean(effective_counts) if len(effective_counts) else np.nan,
+        'Среднее неэффективных': np.mean(ineffective_counts) if len(ineffective_counts) else np.nan,
+        'Медиана эффективных': np.median(effective_counts) if len(effective_counts) else np.nan,
+        'Медиана неэффективных': np.median(ineffective_counts) if len(ineffective_counts) else np.nan,
+    }
+    if len(effective_counts) < MIN_GROUP_SIZE or len(ineffective_counts) < MIN_GROUP_SIZE:
+        result['Тест'] = 'Нет теста'
+        return result
+
+    comparison = compare_group_counts(effective_counts, ineffective_counts)
+    result.update({column: comparison[field] for field, column in RESULT_COLUMNS.items()})
+    return result
+
+
+def _compare_stratum(counts, effective):
+    """Сравнение внутри одной страты (вызывается в рабочем процессе)"""
+    return compare_groups(counts[effective], counts[~effective])
+
+
+def run_stratified_analysis(employee_data, purchase_data, strata_columns=STRATA_COLUMNS, n_jobs=N_JOBS):
+    """
+    Сравнивает эффективных и неэффективных сотрудников внутри каждой страты.
+    Покупки агрегируются один раз для всех сотрудников, затем страты получают только
+    свои массивы счетчиков и считаются параллельно.
+    Возвращает DataFrame: по строке на страту, столбцы страт и результаты тестов.
+    """
+    strata_columns = list(strata_columns)
+    if 'Возрастная группа' in strata_columns and 'Возрастная группа' not in employee_data.columns:
+        employee_data = add_age_bands(employee_data)
+    if TENURE_BAND_COLUMN in strata_columns and TENURE_BAND_COLUMN not in employee_data.columns:
+        employee_data = add_tenure(employee_data)
+
+    aggregates = aggregate_purchases(employee_data, purchase_data)
+    counts = aggregates['employee_counts'].to_numpy()
+    effective = (employee_data['Эффективность'] == True).to_numpy()
+    known = employee_data['Эффективность'].notna().to_numpy()
+
+    strata = employee_data.groupby(strata_columns, observed=True, sort=True).indices
+    keys = list(strata.keys())
+    tasks = [(counts[idx[known[idx]]], effective[idx[known[idx]]]) for idx in strata.values()]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_compare_stratum, *zip(*tasks)))
+    else:
+        results = [_compare_stratum(*task) for task in tasks]
+
+    results_df = pd.DataFrame(results)
+    strata_index = pd.MultiIndex.from_tuples(
+        [key if isinstance(key, tuple) else (key,) for key in keys], names=strata_columns
+    )
+    results_df.index = strata_index
+    return results_df.reset_index()
+
+
+def stratum_power_curves(employee_data, strata_columns=STRATA_COLUMNS, effect_sizes=POWER_EFFECT_SIZES, alpha=0.05):
+    """
+    Кривые мощности t-теста для каждой страты: мощность при каждом размере эффекта
+    с фактическими размерами групп эффективных и неэффективных сотрудников.
+    Покупки не нужны - все страты и размеры эффекта считаются одним вызовом ttest_power.
+    Возвращает DataFrame: строки - страты, столбцы - размеры эффекта.
+    """
+    strata_columns = list(strata_columns)
+    if 'Возрастная группа' in strata_columns and 'Возрастная группа' not in employee_data.columns:
+        employee_data = add_age_bands(employee_data)
+    if TENURE_BAND_COLUMN in strata_columns and TENURE_BAND_COLUMN not in employee_data.columns:
+        employee_data = add_tenure(employee_data)
+
+    known = employee_data[employee_data['Эффективность'].notna()]
+    group_sizes = (known.groupby(strata_columns, observed=True, sort=True)['Эффективность']
+                   .agg(effective=lambda values: (values == True).sum(), total='size'))
+    n_effective = group_sizes['effective'].to_numpy(dtype=float)
+    n_ineffective = group_sizes['total'].to_numpy(dtype=float) - n_effective
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        power = ttest_power(np.asarray(effect_sizes, dtype=float)[None, :], n_effective[:, None],
+                            (n_ineffective / n_effective)[:, None], alpha)
+    # Страты, где в одной из групп меньше MIN_GROUP_SIZE сотрудников, не оцениваются
+    too_small = (n_effective < MIN_GROUP_SIZE) | (n_ineffective < MIN_GROUP_SIZE)
+    power[too_small] = np.nan
+    return pd.DataFrame(power, index=group_sizes.index, columns=pd.Index(effect_sizes, name='Размер эффекта'))
+
+
+if __name__ == "__main__":
+    # Пути к файлам данных
+    employee_data_path = 'pokupki/tps.csv'
+    purchase_data_path = 'pokupki/p.csv'
+
+    try:
+        # Загрузка данных
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
+        employee_data, purchase_data = encode_tables(employee_data, purchase_data)
+
+        results = run_stratified_analysis(employee_data, purchase_data, STRATA_COLUMNS)
+        print(results.to_string(index=False))
+
+        print("\nМощность t-теста по стратам:")
+        print(stratum_power_curves(employee_data, STRATA_COLUMNS).round(3).to_string())
+
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
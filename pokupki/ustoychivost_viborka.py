@@ -1,18 +1,29 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import stats
 import numpy as np
-from statsmodels.stats.power import TTestIndPower
+from grafiki import show_figure
+from zagruzka import load_employee_data, load_purchase_data, encode_tables
+from agregacia import aggregate_purchases, group_employee_counts
+from perestanovki import permutation_test
+from statistika import compare_groups_cached
+from viborki import subsample_stability
 
 # Размер выборки (например, 0.4 для 40%)
 SAMPLE_SIZE = 1.0
 
+# Число перестановок для перестановочного теста (0 - не проводить)
+N_PERMUTATIONS = 0
+
+# Проверка устойчивости на множестве подвыборок (0 - не проводить)
+N_REPLICATES = 1000
+SAMPLE_FRACTIONS = (0.2, 0.4, 0.6, 0.8)
+RANDOM_SEED = 42
+
 def analyze_purchases(employee_data_path, purchase_data_path):
     """Загружает и анализирует данные о сотрудниках и покупках"""
     try:
-        employee_data = pd.read_csv(employee_data_path)
-        purchase_data = pd.read_csv(purchase_data_path, sep=';', on_bad_lines='skip')
+        employee_data = load_employee_data(employee_data_path)
+        purchase_data = load_purchase_data(purchase_data_path)
         
         # Проверка необходимых столбцов
         required_employee_cols = {'Код сотрудника', 'Эффективность'}
@@ -26,7 +37,8 @@ def analyze_purchases(employee_data_path, purchase_data_path):
             missing = required_purchase_cols - set(purchase_data.columns)
             raise KeyError(f"В данных покупок отсутствуют столбцы: {missing}")
 
-        return employee_data, purchase_data
+        # Коды сотрудников и категории - общий словарь pandas Categorical для обеих таблиц
+        return encode_tables(employee_data, purchase_data)
 
     except FileNotFoundError as e:
         raise FileNotFoundError(f"Не удалось найти файл: {e.filename}")
@@ -52,7 +64,7 @@ def plot_employee_effectiveness(employee_data):
                           textcoords='offset points')
     
     plt.tight_layout()
-    plt.show()
+    show_figure('ustoychivost_viborka_employee_effectiveness')
 
 def plot_purchase_comparison(effective_counts, ineffective_counts, sample_size=1.0):
     """Визуализирует сравнение покупок между группами"""
@@ -69,10 +81,10 @@ def plot_purchase_comparison(effective_counts, ineffective_counts, sample_size=1
     plt.ylabel('Количество покупок')
     
     plt.tight_layout()
-    plt.show()
+    show_figure('ustoychivost_viborka_purchase_comparison')
 
-def perform_statistical_analysis(effective_counts, ineffective_counts, sample_size=1.0):
-    """Выполняет статистический анализ"""
+def perform_statistical_analysis(effective_counts, ineffective_counts, sample_size=1.0, n_permutations=0):
+    """Выполняет статистический анализ, печатает и возвращает результаты тестов (GroupComparison)"""
     print("\n" + "="*50)
     print("Статистический анализ различий между группами")
     print("="*50)
@@ -81,9 +93,12 @@ def perform_statistical_analysis(effective_counts, ineffective_counts, sample_si
     effective_sample = np.random.choice(effective_counts, size=int(len(effective_counts) * sample_size), replace=False)
     ineffective_sample = np.random.choice(ineffective_counts, size=int(len(ineffective_counts) * sample_size), replace=False)
     
+    # Все тесты считаются одним вызовом; для тех же счетчиков результат берется из базы результатов
+    result = compare_groups_cached(effective_sample, ineffective_sample)
+    p_normal_effective = result.p_shapiro_effective
+    p_normal_ineffective = result.p_shapiro_ineffective
+
     # Проверка нормальности распределения
-    _, p_normal_effective = stats.shapiro(effective_sample)
-    _, p_normal_ineffective = stats.shapiro(ineffective_sample)
     print(f"\nТест Шапиро-Уилка на нормальность:")
     print(f"Эффективные сотрудники: p-value = {p_normal_effective:.4f}")
     print(f"Неэффективные сотрудники: p-value = {p_normal_ineffective:.4f}")
@@ -91,16 +106,11 @@ def perform_statistical_analysis(effective_counts, ineffective_counts, sample_si
     # Выбор теста в зависимости от нормальности распределения
     if p_normal_effective > 0.05 and p_normal_ineffective > 0.05:
         print("\nДанные распределены нормально, используем t-тест")
-        stat, p_value = stats.ttest_ind(effective_sample, ineffective_sample)
-        test_name = "t-тест"
     elif len(effective_sample) < 2 or len(ineffective_sample) < 2:
         print("\nНедостаточно данных для проведения теста Краскела-Уоллиса или Манна-Уитни")
-        stat, p_value = np.nan, np.nan
-        test_name = "Нет теста"
     else:
         print("\nДанные не распределены нормально, используем тест Краскела-Уоллиса")
-        stat, p_value = stats.kruskal(effective_sample, ineffective_sample)
-        test_name = "Тест Краскела-Уоллиса"
+    stat, p_value, test_name = result.statistic, result.p_value, result.test_name
     
     # Вывод результатов
     print(f"\nРезультаты {test_name}:")
@@ -114,16 +124,14 @@ def perform_statistical_analysis(effective_counts, ineffective_counts, sample_si
         print("\nВывод: Невозможно сделать вывод из-за недостатка данных.")
     
     # Анализ мощности теста
-    effect_size = (np.mean(effective_sample) - np.mean(ineffective_sample)) / np.std(np.concatenate([effective_sample, ineffective_sample]))
-    power = TTestIndPower().solve_power(effect_size=effect_size, 
-                                      nobs1=len(effective_sample), 
-                                      alpha=0.05)
+    effect_size = result.effect_size
+    power = result.power
     print(f"\nАнализ мощности теста:")
     print(f"Размер эффекта: {effect_size:.3f}")
     print(f"Мощность теста: {power:.3f}")
 
     # Mann-Whitney test
-    stat_mann, p_value_mann = stats.mannwhitneyu(effective_sample, ineffective_sample)
+    stat_mann, p_value_mann = result.mann_whitney_statistic, result.mann_whitney_p_value
     test_name_mann = "Тест Манна-Уитни"
     print(f"\nРезультаты {test_name_mann}:")
     print(f"Статистика: {stat_mann:.3f}, p-value: {p_value_mann:.4f}")
@@ -133,10 +141,20 @@ def perform_statistical_analysis(effective_counts, ineffective_counts, sample_si
     else:
         print("\nВывод: Нет статистически значимых различий между группами (p ≥ 0.05)")
 
+    # Перестановочный тест: не требует нормальности, подходит для счетчиков с большим числом нулей
+    if n_permutations > 0:
+        permutation_results = permutation_test(effective_sample, ineffective_sample, n_permutations)
+        print(f"\nПерестановочный тест ({permutation_results['Перестановок'].iloc[0]} перестановок):")
+        print(permutation_results.to_string())
+
+    return result
+
 def analyze_category_distribution(purchase_data, effective_employees):
     """Анализирует распределение покупок по категориям"""
     effective_purchases = purchase_data[purchase_data['Код сотрудника'].isin(effective_employees)]
-    category_distribution = effective_purchases['Категория'].value_counts().reset_index()
+    category_distribution = effective_purchases['Категория'].value_counts()
+    # value_counts по Categorical возвращает и категории без покупок
+    category_distribution = category_distribution[category_distribution > 0].reset_index()
     category_distribution.columns = ['Категория', 'Количество']
     
     # Визуализация топ-10 категорий
@@ -148,7 +166,7 @@ def analyze_category_distribution(purchase_data, effective_employees):
     plt.xlabel('Количество покупок')
     plt.ylabel('Категория')
     plt.tight_layout()
-    plt.show()
+    show_figure('ustoychivost_viborka_top10_categories')
     
     return category_distribution
 
@@ -171,16 +189,11 @@ if __name__ == "__main__":
         effective_employees = employee_data[employee_data['Эффективность'] == True]['Код сотрудника']
         ineffective_employees = employee_data[employee_data['Эффективность'] == False]['Код сотрудника']
         
-        # Подсчет количества покупок для каждого сотрудника
-        effective_counts = purchase_data[purchase_data['Код сотрудника'].isin(effective_employees)]['Код сотрудника'].value_counts()
-        ineffective_counts = purchase_data[purchase_data['Код сотрудника'].isin(ineffective_employees)]['Код сотрудника'].value_counts()
-        
-        # Заполнение нулями для сотрудников без покупок
-        all_effective = pd.Series(0, index=effective_employees)
-        all_ineffective = pd.Series(0, index=ineffective_employees)
-        
-        effective_counts = all_effective.add(effective_counts, fill_value=0).values
-        ineffective_counts = all_ineffective.add(ineffective_counts, fill_value=0).values
+        # Подсчет количества покупок для каждого сотрудника за один проход,
+        # сотрудники без покупок получают нули
+        aggregates = aggregate_purchases(employee_data, purchase_data)
+        effective_counts = group_employee_counts(aggregates, True)
+        ineffective_counts = group_employee_counts(aggregates, False)
         
         # Основные метрики
         print("\nОсновные метрики:")
@@ -193,7 +206,14 @@ if __name__ == "__main__":
         print(f"Медиана: {np.median(ineffective_counts):.2f}")
         
         # Статистический анализ
-        perform_statistical_analysis(effective_counts, ineffective_counts, SAMPLE_SIZE)
+        perform_statistical_analysis(effective_counts, ineffective_counts, SAMPLE_SIZE, N_PERMUTATIONS)
+        
+        # Распределение p-value и размера эффекта по подвыборкам разного размера
+        if N_REPLICATES > 0:
+            _, stability_summary = subsample_stability(effective_counts, ineffective_counts,
+                                                       SAMPLE_FRACTIONS, N_REPLICATES, RANDOM_SEED)
+            print(f"\nУстойчивость результатов ({N_REPLICATES} подвыборок на каждую долю):")
+            print(stability_summary.T.to_string())
         
         # Визуализация сравнения покупок
         plot_purchase_comparison(effective_counts, ineffective_counts, SAMPLE_SIZE)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+import rangi
+
+# Доли выборки, для которых по умолчанию проверяется устойчивость результата
+DEFAULT_SAMPLE_FRACTIONS = (0.2, 0.4, 0.6, 0.8)
+
+# Сколько повторов обрабатывается одной матрицей индексов; ограничивает пиковую память
+DEFAULT_BLOCK_SIZE = 1000
+
+
+def draw_subsample_indices(rng, n, size, n_replicates, replace=False):
+    """
+    Возвращает матрицу индексов (n_replicates x size): каждая строка - одна подвыборка.
+    Без возвращения строки получаются частичной сортировкой случайных ключей.
+    """
+    if replace:
+        return rng.integers(0, n, size=(n_replicates, size))
+    if size == n:
+        return np.argsort(rng.random((n_replicates, n)), axis=1)
+    return np.argpartition(rng.random((n_replicates, n)), size, axis=1)[:, :size]
+
+
+def _replicate_statistics(effective_samples, ineffective_samples):
+    """Считает статистики сразу для всех строк-повторов"""
+    mean_diff = effective_samples.mean(axis=1) - ineffective_samples.mean(axis=1)
+    effect_size = mean_diff / np.concatenate([effective_samples, ineffective_samples], axis=1).std(axis=1)
+    t_stat, t_pvalue = stats.ttest_ind(effective_samples, ineffective_samples, axis=1)
+    # Ранговый тест по гистограммам счетчиков сразу для всех повторов
+    u_stat, u_pvalue = rangi.mannwhitneyu(effective_samples, ineffective_samples)
+    return {
+        'Разница средних': mean_diff,
+        'Размер эффекта': effect_size,
+        't-статистика': t_stat,
+        'p-value t-теста': t_pvalue,
+        'U-статистика': u_stat,
+        'p-value Манна-Уитни': u_pvalue,
+    }
+
+
+def subsample_stability(effective_counts, ineffective_counts, sample_fractions=DEFAULT_SAMPLE_FRACTIONS,
+                        n_replicates=1000, seed=0, replace=False, confidence=0.95,
+                        block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Проверяет устойчивость сравнения групп на множестве подвыборок.
+    Для каждой доли выборки берет n_replicates подвыборок из обеих групп одной матрицей
+    индексов и считает разницу средних, размер эффекта, t-тест и тест Манна-Уитни
+    для всех повторов сразу, без цикла по повторам.
+
+    Возвращает два DataFrame:
+      replicates - по строке на каждый повтор;
+      summary    - по строке на долю выборки: среднее и доверительный интервал
+                   каждой величины, доля повторов с p < 0.05.
+    """
+    effective_counts = np.asarray(effective_counts, dtype=float)
+    ineffective_counts = np.asarray(ineffective_counts, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    replicate_frames = []
+    for fraction in sample_fractions:
+        effective_size = int(len(effective_counts) * fraction)
+        ineffective_size = int(len(ineffective_counts) * fraction)
+        if effective_size < 2 or ineffective_size < 2:
+            raise ValueError(f"Доля выборки {fraction} оставляет меньше двух наблюдений в группе")
+
+        for start in range(0, n_replicates, block_size):
+            n_block = min(block_size, n_replicates - start)
+            effective_idx = draw_subsample_indices(rng, len(effective_counts), effective_size, n_block, replace)
+            ineffective_idx = draw_subsample_indices(rng, len(ineffective_counts), ineffective_size, n_block, replace)
+
+            block = pd.DataFrame(_replicate_statistics(effective_counts[effective_idx],
+                                                       ineffective_counts[ineffective_idx]))
+            block.insert(0, 'Повтор', np.arange(start, start + n_block))
+            block.insert(0, 'Доля выборки', fraction)
+            replicate_frames.append(block)
+
+    replicates = pd.concat(replicate_frames, ignore_index=True)
+    return replicates, summarize_replicates(replicates, confidence)
+
+
+def summarize_replicates(replicates, confidence=0.95, alpha=0.05):
+    """Сводит повторы по долям выборки: среднее, перцентильный интервал и доля значимых результатов"""
+    lower_q = (1 - confidence) / 2
+    upper_q = 1 - lower_q
+    metrics = [column for column in replicates.columns if column not in ('Доля выборки', 'Повтор')]
+
+    grouped = replicates.groupby('Доля выборки')
+    summary = {}
+    for metric in metrics:
+        summary[(metric, 'среднее')] = grouped[metric].mean()
+        summary[(metric, 'нижняя граница')] = grouped[metric].quantile(lower_q)
+        summary[(metric, 'верхняя граница')] = grouped[metric].quantile(upper_q)
+    summary[(f'Доля p < {alpha}', 't-тест')] = grouped['p-value t-теста'].apply(lambda p: (p < alpha).mean())
+    summary[(f'Доля p < {alpha}', 'Манна-Уитни')] = grouped['p-value Манна-Уитни'].apply(lambda p: (p < alpha).mean())
+
+    return pd.DataFrame(summary)
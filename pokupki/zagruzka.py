@@ -0,0 +1,127 @@
+import os
+import glob
+import re
+import pandas as pd
+from chtenie import read_csv_quarantined
+from zamery import stage
+
+# Feather требует pyarrow; без него читаем CSV напрямую, как раньше
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Каталог с бинарным кэшем создается рядом с исходным CSV
+CACHE_DIR_NAME = '.cache'
+
+
+def _cache_path(source_path):
+    """Возвращает путь к файлу кэша, ключом служат размер и mtime исходного файла"""
+    stat = os.stat(source_path)
+    directory, name = os.path.split(os.path.abspath(source_path))
+    base = os.path.splitext(name)[0]
+    cache_name = f'{base}-{stat.st_size}-{stat.st_mtime_ns}.feather'
+    return os.path.join(directory, CACHE_DIR_NAME, cache_name)
+
+
+def _remove_stale_caches(cache_path):
+    """
+    Удаляет кэши того же файла, построенные по его старым версиям.
+    Имя проверяется целиком ({base}-{размер}-{mtime}.feather), чтобы не задеть кэши
+    других файлов с тем же началом имени (например, tps-2024.csv рядом с tps.csv).
+    """
+    directory, name = os.path.split(cache_path)
+    base = name.rsplit('-', 2)[0]
+    stale_name = re.compile(rf'{re.escape(base)}-\d+-\d+\.feather')
+    for stale in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(base)}-*-*.feather')):
+        if stale != cache_path and stale_name.fullmatch(os.path.basename(stale)):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_cached_csv(path, reader=pd.read_csv, **read_csv_kwargs):
+    """
+    Читает CSV через колоночный кэш Feather.
+    Кэш пересобирается, только если у CSV изменились размер или время модификации.
+    reader - функция чтения CSV при отсутствии кэша (по умолчанию pd.read_csv).
+    Число отклоненных строк (chtenie) попадает в замер этапа как 'rejected'.
+    """
+    with stage('load', path=path) as record:
+        data = _load_cached_csv(path, reader, record, **read_csv_kwargs)
+        record['rows'] = len(data)
+        if 'Отклонено строк' in data.attrs:
+            record['rejected'] = data.attrs['Отклонено строк']
+    return data
+
+
+def _load_cached_csv(path, reader, record, **read_csv_kwargs):
+    """Чтение через кэш; в record отмечается, был ли использован кэш"""
+    record['cached'] = False
+    if not HAS_PYARROW:
+        return reader(path, **read_csv_kwargs)
+
+    cache_path = _cache_path(path)
+    if os.path.exists(cache_path):
+        record['cached'] = True
+        return pd.read_feather(cache_path)
+
+    data = reader(path, **read_csv_kwargs)
+
+    # Пишем во временный файл и переименовываем, чтобы параллельные запуски
+    # не прочитали недописанный кэш
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        data.reset_index(drop=True).to_feather(tmp_path)
+        os.replace(tmp_path, cache_path)
+        _remove_stale_caches(cache_path)
+    except OSError:
+        # Каталог может быть недоступен для записи: работаем без кэша
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return data
+
+
+def load_employee_data(employee_data_path):
+    """Загружает таблицу сотрудников (tps.csv)"""
+    return load_cached_csv(employee_data_path)
+
+
+def load_purchase_data(purchase_data_path):
+    """
+    Загружает таблицу покупок (разделитель ';').
+    Битые строки не пропускаются молча, а сохраняются в файл отклоненных строк (см. chtenie).
+    """
+    return load_cached_csv(purchase_data_path, reader=read_csv_quarantined, sep=';')
+
+
+# Строковые столбцы, которые переводятся в pandas Categorical
+CATEGORICAL_COLUMNS = ('Категория', 'Факт. департамент', 'Пол')
+
+
+def encode_tables(employee_data, purchase_data):
+    """
+    Переводит строковые столбцы обеих таблиц в pandas Categorical.
+    'Код сотрудника' кодируется одним словарем для двух таблиц: сначала коды из таблицы
+    сотрудников в ее порядке, затем коды, которые встречаются только в покупках.
+    Поэтому целочисленный код сотрудника в обеих таблицах означает одно и то же,
+    и сравнения, подсчеты и соединения идут по массивам int вместо строк.
+    """
+    employee_codes = pd.Index(employee_data['Код сотрудника'].dropna().unique())
+    purchase_codes = pd.Index(purchase_data['Код сотрудника'].dropna().unique())
+    code_dtype = pd.CategoricalDtype(employee_codes.append(purchase_codes.difference(employee_codes, sort=False)))
+
+    encoded = []
+    for table in (employee_data, purchase_data):
+        table = table.copy(deep=False)
+        table['Код сотрудника'] = table['Код сотрудника'].astype(code_dtype)
+        for column in CATEGORICAL_COLUMNS:
+            if column in table.columns:
+                table[column] = table[column].astype('category')
+        encoded.append(table)
+
+    return encoded[0], encoded[1]
@@ -0,0 +1,134 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# resource есть только в Unix; без него пиковая память не записывается
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Файл для замеров (по строке JSON на этап); None - замеры только в журнал на уровне DEBUG
+METRICS_PATH = os.environ.get('POKUPKI_METRICS')
+
+# Этап, для которого снимается профиль cProfile / распределение памяти tracemalloc
+PROFILE_STAGE = os.environ.get('POKUPKI_PROFILE_STAGE')
+TRACEMALLOC_STAGE = os.environ.get('POKUPKI_TRACEMALLOC_STAGE')
+
+# Уровень журнала по умолчанию: отладочные сообщения скрыты
+LOG_LEVEL = os.environ.get('POKUPKI_LOG_LEVEL', 'WARNING')
+
+# Сколько строк профиля и мест выделения памяти выводить
+PROFILE_TOP = 20
+
+logger = logging.getLogger('pokupki')
+
+
+def setup_logging(level=None):
+    """Настраивает журнал: уровень из аргумента или переменной POKUPKI_LOG_LEVEL"""
+    logging.basicConfig(level=(level or LOG_LEVEL).upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+
+def configure_metrics(metrics_path=None, profile_stage=None, tracemalloc_stage=None):
+    """
+    Задает файл замеров и этапы для cProfile и tracemalloc вместо переменных окружения.
+    Незаданные (None) аргументы не меняют значений из переменных окружения.
+    """
+    global METRICS_PATH, PROFILE_STAGE, TRACEMALLOC_STAGE
+    if metrics_path is not None:
+        METRICS_PATH = metrics_path
+    if profile_stage is not None:
+        PROFILE_STAGE = profile_stage
+    if tracemalloc_stage is not None:
+        TRACEMALLOC_STAGE = tracemalloc_stage
+
+
+def peak_rss_mb():
+    """Пиковый размер памяти процесса (МБ) или None, если его не узнать"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS - в байтах
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def emit(record):
+    """Записывает замер строкой JSON: в журнал (DEBUG) и в файл замеров, если он задан"""
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    logger.debug(line)
+    if METRICS_PATH:
+        with open(METRICS_PATH, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def _profile_report(profiler, name):
+    """Сохраняет профиль рядом с файлом замеров и выводит самые дорогие функции в журнал"""
+    if METRICS_PATH:
+        profiler.dump_stats(f'{os.path.splitext(METRICS_PATH)[0]}.{name}.prof')
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    logger.info("Профиль этапа %s:\n%s", name, text.getvalue())
+
+
+def _tracemalloc_report(record, name):
+    """Добавляет к замеру пик памяти по tracemalloc и выводит главные места выделения памяти"""
+    _, peak = tracemalloc.get_traced_memory()
+    record['traced_peak_mb'] = round(peak / (1024 * 1024), 3)
+    top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+    logger.info("Выделение памяти на этапе %s:\n%s", name, '\n'.join(str(line) for line in top))
+    tracemalloc.stop()
+
+
+@contextmanager
+def stage(name, **fields):
+    """
+    Замеряет этап обработки: время (общее и процессорное), пиковую память процесса,
+    на сколько этап поднял этот пик, и число строк. Число строк и другие поля вызывающий код
+    записывает в возвращаемый словарь:
+
+        with stage('load', path=path) as record:
+            data = ...
+            record['rows'] = len(data)
+
+    Для этапа PROFILE_STAGE дополнительно снимается профиль cProfile,
+    для TRACEMALLOC_STAGE - распределение памяти tracemalloc.
+    """
+    record = {'stage': name, **fields}
+    profiler = cProfile.Profile() if name == PROFILE_STAGE else None
+    trace = name == TRACEMALLOC_STAGE and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    # ru_maxrss - пик за все время работы процесса, поэтому для этапа записывается его прирост
+    rss_start = peak_rss_mb()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+        record['cpu_s'] = round(time.process_time() - cpu_start, 6)
+        record['peak_rss_mb'] = peak_rss_mb()
+        if rss_start is not None:
+            record['peak_rss_growth_mb'] = round(record['peak_rss_mb'] - rss_start, 3)
+        record['pid'] = os.getpid()
+        if trace:
+            _tracemalloc_report(record, name)
+        if profiler is not None:
+            _profile_report(profiler, name)
+        emit(record)
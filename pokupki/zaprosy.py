@@ -0,0 +1,217 @@
+import os
+
+import numpy as np
+import pandas as pd
+from chtenie import NA_VALUES
+from dano import PRODUCTIVITY_QUANTILE
+from zagruzka import CACHE_DIR_NAME
+
+# DuckDB - необязательная зависимость: без нее анализы идут через pandas
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+# Ограничение памяти DuckDB (например, '4GB'); None - по умолчанию DuckDB (80% памяти).
+# Что не помещается, DuckDB сбрасывает на диск в каталог кэша рядом с файлом покупок
+MEMORY_LIMIT = os.environ.get('POKUPKI_DUCKDB_MEMORY')
+
+# Число потоков DuckDB; None - по числу ядер
+THREADS = None
+
+# Типы столбцов, которые читают запросы; остальные столбцы CSV читаются строками,
+# так что строки не отбрасываются из-за неудачного определения типа чужого столбца
+COLUMN_TYPES = {
+    'Код сотрудника': 'VARCHAR',
+    'Категория': 'VARCHAR',
+    'Эффективность': 'BOOLEAN',
+    'Продуктивность сотрудника': 'DOUBLE',
+}
+
+
+def _identifier(name):
+    """Имя столбца в кавычках для SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    """Строка в кавычках для SQL"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _scan(path, sep=',', columns=()):
+    """
+    Источник строк для SQL: Parquet читается как есть, CSV - с заданным разделителем.
+    Типы столбцов columns задаются явно (COLUMN_TYPES), все прочие столбцы читаются строками;
+    пропусками, как в pandas, считаются строки chtenie.NA_VALUES.
+    Пропускаются только битые строки CSV (в pandas-пути они уходят в файл отклоненных строк).
+    """
+    if path.endswith('.parquet'):
+        return f"read_parquet({_literal(os.path.abspath(path))})"
+    types = ', '.join(f"{_literal(column)}: '{COLUMN_TYPES[column]}'"
+                      for column in columns if column in COLUMN_TYPES)
+    nulls = ', '.join(_literal(value) for value in NA_VALUES)
+    return (f"read_csv({_literal(os.path.abspath(path))}, header=true, delim='{sep}', all_varchar=true, "
+            f"nullstr=[{nulls}], ignore_errors=true, types={{{types}}})")
+
+
+def connect(purchase_data_path, memory_limit=MEMORY_LIMIT, threads=THREADS):
+    """
+    Открывает DuckDB в памяти процесса. Запросы выполняются в несколько потоков,
+    а промежуточные данные сверх memory_limit сбрасываются на диск.
+    """
+    if not HAS_DUCKDB:
+        raise ImportError("Для SQL-расчета нужен пакет duckdb")
+    directory = os.path.dirname(os.path.abspath(purchase_data_path))
+    config = {'temp_directory': os.path.join(directory, CACHE_DIR_NAME, 'duckdb')}
+    if memory_limit is not None:
+        config['memory_limit'] = memory_limit
+    if threads is not None:
+        config['threads'] = threads
+    return duckdb.connect(config=config)
+
+
+def purchase_aggregates(employee_data_path, purchase_data_path, group_column='Эффективность', connection=None):
+    """
+    Те же агрегаты, что agregacia.aggregate_purchases, но SQL-запросами DuckDB прямо по
+    файлам (CSV или Parquet): в память попадают только итоги, а не таблица покупок.
+    Результат можно передать в compare_store_popularity и compare_average_purchases
+    через аргумент aggregates. Коды сотрудников в таблице сотрудников должны быть уникальны.
+    """
+    connection = connection or connect(purchase_data_path)
+    group = _identifier(group_column)
+    employee_scan = _scan(employee_data_path, columns=['Код сотрудника', group_column])
+    purchase_scan = _scan(purchase_data_path, ';', columns=['Код сотрудника', 'Категория'])
+    tables = f"""
+        WITH employees AS (SELECT "Код сотрудника" AS code, {group} AS grp FROM {employee_scan}),
+             purchases AS (SELECT "Код сотрудника" AS code, "Категория" AS category FROM {purchase_scan}),
+             joined AS (SELECT p.category, e.grp FROM purchases p JOIN employees e USING (code))
+    """
+
+    # Таблица сотрудников небольшая: порядок строк сохраняется (preserve_insertion_order)
+    employees = connection.sql(f"SELECT {group} AS grp, \"Код сотрудника\" AS code "
+                               f"FROM {employee_scan}").df()
+    employee_counts = connection.sql(tables + """
+        SELECT code, count(*) AS n FROM purchases WHERE code IN (SELECT code FROM employees) GROUP BY code
+    """).df()
+    group_sizes = connection.sql(tables + """
+        SELECT grp, count(*) AS n FROM employees WHERE grp IS NOT NULL GROUP BY grp ORDER BY grp
+    """).df()
+    group_purchases = connection.sql(tables + """
+        SELECT grp, count(*) AS n FROM joined WHERE grp IS NOT NULL GROUP BY grp
+    """).df()
+    category_group = connection.sql(tables + """
+        SELECT category, grp, count(*) AS n FROM joined
+        WHERE grp IS NOT NULL AND category IS NOT NULL GROUP BY category, grp
+    """).df()
+
+    employee_codes = pd.Index(employees['code'].astype(str), name='Код сотрудника')
+    groups = pd.Index(group_sizes['grp'].tolist())
+    category_counts = (category_group.pivot(index='category', columns='grp', values='n')
+                       .reindex(columns=groups).fillna(0).astype(np.int64).sort_index())
+    category_counts.index = pd.Index(category_counts.index.astype(str), name='Категория')
+    category_counts.columns = groups
+
+    return {
+        'employee_counts': (employee_counts.set_index('code')['n'].reindex(employee_codes, fill_value=0)
+                            .astype(np.int64).rename(None)),
+        'employee_groups': pd.Series(employees['grp'].to_numpy(), index=employee_codes),
+        'group_sizes': pd.Series(group_sizes['n'].to_numpy(np.int64), index=groups),
+        'group_purchases': pd.Series(group_purchases.set_index('grp')['n'].reindex(groups, fill_value=0)
+                                     .to_numpy(np.int64), index=groups),
+        'category_counts': category_counts,
+    }
+
+
+def category_distribution(employee_data_path, purchase_data_path, quantile=PRODUCTIVITY_QUANTILE, connection=None):
+    """
+    Распределение категорий покупок высокопродуктивных сотрудников (как dano.analyze_purchases):
+    порог продуктивности (квантиль с линейной интерполяцией, как в pandas), отбор покупок
+    и подсчет по категориям выполняются одним SQL-запросом.
+    """
+    connection = connection or connect(purchase_data_path)
+    counts = connection.execute(f"""
+        WITH employees AS (SELECT "Код сотрудника" AS code, "Продуктивность сотрудника" AS productivity
+                           FROM {_scan(employee_data_path, columns=['Код сотрудника', 'Продуктивность сотрудника'])}),
+             threshold AS (SELECT quantile_cont(productivity, ?) AS value FROM employees)
+        SELECT "Категория" AS category,
+               count(*) FILTER (WHERE "Код сотрудника" IN
+                   (SELECT code FROM employees, threshold WHERE productivity >= threshold.value)) AS n
+        FROM {_scan(purchase_data_path, ';', columns=['Код сотрудника', 'Категория'])}
+        WHERE "Категория" IS NOT NULL
+        GROUP BY category ORDER BY category
+    """, [quantile]).df()
+
+    # Категории всех покупок - словарь Categorical, как после encode_tables;
+    # порядок как у value_counts: по убыванию числа покупок
+    categories = pd.Index(counts['category'].astype(str).to_numpy())
+    # Устойчивая сортировка: при равном числе покупок порядок категорий, как у value_counts
+    distribution = (pd.Series(counts['n'].to_numpy(np.int64), index=categories)
+                    .sort_values(ascending=False, kind='stable'))
+    distribution = distribution[distribution > 0]
+    return pd.DataFrame({'Категория': pd.Categorical(distribution.index, categories=categories),
+                         'count': distribution.values})
+
+
+def check_parity(employee_data_path, purchase_data_path):
+    """
+    Сверяет результаты SQL-расчета и pandas-расчета: популярность магазинов, среднее число
+    покупок на сотрудника и распределение категорий должны совпадать.
+    Возвращает список расхождений (пустой, если результаты одинаковы).
+    """
+    # Модули анализов импортируются здесь: они нужны только для сверки
+    from agregacia import aggregate_purchases
+    from dano import analyze_purchases
+    from popularishop import compare_average_purchases, compare_store_popularity
+    from zagruzka import encode_tables, load_employee_data, load_purchase_data
+
+    connection = connect(purchase_data_path)
+    employee_data, purchase_data = encode_tables(load_employee_data(employee_data_path),
+                                                 load_purchase_data(purchase_data_path))
+    pandas_aggregates = aggregate_purchases(employee_data, purchase_data)
+    sql_aggregates = purchase_aggregates(employee_data_path, purchase_data_path, connection=connection)
+
+    checks = {
+        'Популярность магазинов': (
+            compare_store_popularity(employee_data, purchase_data, pandas_aggregates),
+            compare_store_popularity(None, None, sql_aggregates),
+        ),
+        'Среднее число покупок': (
+            pd.Series(compare_average_purchases(employee_data, purchase_data, pandas_aggregates)),
+            pd.Series(compare_average_purchases(None, None, sql_aggregates)),
+        ),
+        'Распределение категорий': (
+            analyze_purchases(employee_data_path, purchase_data_path),
+            category_distribution(employee_data_path, purchase_data_path, connection=connection),
+        ),
+    }
+
+    mismatches = []
+    for name, (expected, actual) in checks.items():
+        try:
+            if isinstance(expected, pd.DataFrame):
+                pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+            else:
+                pd.testing.assert_series_equal(actual, expected, check_exact=True)
+        except AssertionError as e:
+            mismatches.append(f"{name}: {e}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    employee_data_path = 'pokupki/tps.csv'
+    purchase_data_path = 'pokupki/p.csv'
+
+    try:
+        mismatches = check_parity(employee_data_path, purchase_data_path)
+        if mismatches:
+            print("Результаты SQL и pandas различаются:")
+            for mismatch in mismatches:
+                print(mismatch)
+        else:
+            print("Результаты SQL и pandas совпадают")
+    except ImportError as e:
+        print(f"Ошибка: {e}")
+    except FileNotFoundError as e:
+        print(f"Ошибка: Не удалось найти файл: {e.filename}")
@@ -0,0 +1,259 @@
+# Единая точка запуска анализов покупок, например:
+#   python pokupki/zapusk.py kategorii
+#   python pokupki/zapusk.py magaziny --test mannwhitney
+#   python pokupki/zapusk.py ustoichivost --no-plot --import-time
+#   python pokupki/zapusk.py kategorii --metrics zamery.jsonl --profile-stage load
+# Тяжелые библиотеки (scipy, matplotlib, seaborn) импортируются только теми подкомандами,
+# которым они нужны; с --no-plot библиотеки графиков не импортируются вовсе.
+import argparse
+import importlib
+import sys
+import time
+
+_START = time.perf_counter()
+
+# Время импорта модулей, загруженных через lazy_import (секунды)
+IMPORT_TIMES = {}
+
+EMPLOYEE_DATA_PATH = 'pokupki/tps.csv'
+PURCHASE_DATA_PATH = 'pokupki/p.csv'
+
+
+def lazy_import(name):
+    """Импортирует модуль по имени и запоминает, сколько занял импорт"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+def _load_tables(args):
+    """Загружает и кодирует таблицы сотрудников и покупок"""
+    lazy_import('pandas')
+    zagruzka = lazy_import('zagruzka')
+    employee_data = zagruzka.load_employee_data(args.employees)
+    purchase_data = zagruzka.load_purchase_data(args.purchases)
+    return zagruzka.encode_tables(employee_data, purchase_data)
+
+
+def _plotting(args):
+    """Импортирует библиотеки графиков, если графики нужны"""
+    if args.no_plot:
+        return False
+    lazy_import('matplotlib.pyplot')
+    return True
+
+
+def run_kategorii(args):
+    """Распределение категорий покупок высокопродуктивных сотрудников (dano)"""
+    lazy_import('pandas')
+    dano = lazy_import('dano')
+    if args.sweep:
+        sweep = dano.sweep_purchases(args.employees, args.purchases)
+        print(sweep.to_string())
+        return
+    if args.backend == 'duckdb':
+        zaprosy = lazy_import('zaprosy')
+        category_distribution = zaprosy.category_distribution(args.employees, args.purchases)
+    else:
+        category_distribution = dano.analyze_purchases(args.employees, args.purchases, args.chunksize)
+    print(category_distribution)
+    if _plotting(args):
+        return [(dano.plot_category_distribution, (category_distribution,))]
+
+
+def run_magaziny(args):
+    """Популярность магазинов у эффективных и неэффективных сотрудников (popularishop)"""
+    popularishop = lazy_import('popularishop')
+    if args.backend == 'duckdb' and args.test is None:
+        # Покупки агрегируются SQL-запросами по файлу; в память читается только таблица сотрудников
+        zaprosy = lazy_import('zaprosy')
+        aggregates = zaprosy.purchase_aggregates(args.employees, args.purchases)
+        employee_data, purchase_data = lazy_import('zagruzka').load_employee_data(args.employees), None
+    else:
+        # Проверке значимости нужны покупки каждого сотрудника, поэтому она идет через pandas
+        employee_data, purchase_data = _load_tables(args)
+        agregacia = lazy_import('agregacia')
+        if args.test is not None:
+            lazy_import('scipy.stats')
+        aggregates = agregacia.aggregate_purchases(employee_data, purchase_data)
+
+    store_comparison = popularishop.compare_store_popularity(employee_data, purchase_data, aggregates, args.test)
+    print("\nСравнение популярности магазинов:")
+    print(store_comparison)
+
+    avg_effective, avg_ineffective = popularishop.compare_average_purchases(employee_data, purchase_data, aggregates)
+    print(f"\nСреднее количество покупок на эффективного сотрудника: {avg_effective:.2f}")
+    print(f"Среднее количество покупок на неэффективного сотрудника: {avg_ineffective:.2f}")
+
+    if _plotting(args):
+        return [(popularishop.plot_employee_effectiveness, (employee_data,))]
+
+
+def run_ustoichivost(args):
+    """Сравнение числа покупок эффективных и неэффективных сотрудников (ustoichivost)"""
+    np = lazy_import('numpy')
+    employee_data, purchase_data = _load_tables(args)
+    agregacia = lazy_import('agregacia')
+    ustoichivost = lazy_import('ustoichivost')
+    lazy_import('scipy.stats')
+
+    aggregates = agregacia.aggregate_purchases(employee_data, purchase_data)
+    effective_counts = agregacia.group_employee_counts(aggregates, True)
+    ineffective_counts = agregacia.group_employee_counts(aggregates, False)
+
+    print("\nОсновные метрики:")
+    print(f"Эффективные сотрудники (n={len(effective_counts)}):")
+    print(f"Среднее количество покупок: {np.mean(effective_counts):.2f}")
+    print(f"Медиана: {np.median(effective_counts):.2f}")
+    print(f"\nНеэффективные сотрудники (n={len(ineffective_counts)}):")
+    print(f"Среднее количество покупок: {np.mean(ineffective_counts):.2f}")
+    print(f"Медиана: {np.median(ineffective_counts):.2f}")
+
+    ustoichivost.perform_statistical_analysis(effective_counts, ineffective_counts, args.permutations)
+
+    if _plotting(args):
+        lazy_import('seaborn')
+        return [
+            (ustoichivost.plot_employee_effectiveness, (employee_data,)),
+            (ustoichivost.plot_purchase_comparison, (effective_counts, ineffective_counts)),
+        ]
+
+
+def run_strata(args):
+    """Сравнение групп внутри страт (ustoychivost_strata)"""
+    employee_data, purchase_data = _load_tables(args)
+    lazy_import('scipy.stats')
+    strata = lazy_import('ustoychivost_strata')
+
+    results = strata.run_stratified_analysis(employee_data, purchase_data, args.by, args.jobs)
+    print(results.to_string(index=False))
+    print("\nМощность t-теста по стратам:")
+    print(strata.stratum_power_curves(employee_data, args.by).round(3).to_string())
+
+
+def run_korrelyacii(args):
+    """Матрица корреляций числовых столбцов таблицы сотрудников и числа покупок"""
+    employee_data, purchase_data = _load_tables(args)
+    agregacia = lazy_import('agregacia')
+    lazy_import('scipy.stats')
+    korrelyacii = lazy_import('korrelyacii')
+    stazh = lazy_import('stazh')
+
+    aggregates = agregacia.aggregate_purchases(employee_data, purchase_data)
+    if stazh.TENURE_COLUMN in employee_data.columns:
+        employee_data = stazh.add_tenure(employee_data)
+    numeric_data = employee_data.select_dtypes(include=['number']).copy()
+    numeric_data['Количество покупок'] = aggregates['employee_counts'].to_numpy()
+
+    corr_matrix, p_values, _ = korrelyacii.correlation_matrix(numeric_data, args.method)
+    print(corr_matrix.round(3).to_string())
+    if _plotting(args):
+        return [(korrelyacii.plot_correlation_heatmap, (corr_matrix,))]
+
+
+def run_kub(args):
+    """Узел оргструктуры и его дочерние узлы из сохраненного куба (kub)"""
+    lazy_import('pandas')
+    kub = lazy_import('kub')
+    cube = kub.cached_cube(args.employees, args.purchases)
+    try:
+        node = kub.cube_node(cube, *args.path)
+    except KeyError:
+        print(f"Ошибка: Узел не найден: {' / '.join(args.path)}")
+        return
+    print(node.round(3).to_string())
+    print()
+    print(kub.drill_down(cube, *args.path).round(3).to_string())
+
+
+def print_import_report():
+    """Печатает время импорта модулей и общее время работы (в stderr, чтобы не смешивать с результатами)"""
+    total = time.perf_counter() - _START
+    print("\nВремя импорта модулей:", file=sys.stderr)
+    for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        print(f"  {name:<25} {seconds:7.3f} с", file=sys.stderr)
+    print(f"  {'всего импорт':<25} {sum(IMPORT_TIMES.values()):7.3f} с", file=sys.stderr)
+    print(f"  {'всего работа':<25} {total:7.3f} с", file=sys.stderr)
+
+
+def build_parser():
+    """Аргументы командной строки: общие пути и параметры графиков, подкоманды анализов"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--employees', default=EMPLOYEE_DATA_PATH, help='таблица сотрудников (tps.csv)')
+    common.add_argument('--purchases', default=PURCHASE_DATA_PATH, help='таблица покупок')
+    common.add_argument('--no-plot', action='store_true', help='не строить графики и не импортировать их библиотеки')
+    common.add_argument('--plot-dir', help='сохранять графики в каталог вместо показа на экране')
+    common.add_argument('--plot-jobs', type=int, help='число процессов для построения графиков')
+    common.add_argument('--plot-profile', default='report', help="профиль сохранения графиков ('report' или 'preview')")
+    common.add_argument('--import-time', action='store_true', help='напечатать время импорта модулей')
+    common.add_argument('--backend', choices=['pandas', 'duckdb'], default='pandas',
+                        help='расчет в pandas или SQL-запросами DuckDB по файлам (kategorii, magaziny)')
+    common.add_argument('--log-level', help='уровень журнала (DEBUG, INFO, WARNING)')
+    common.add_argument('--metrics', help='файл замеров этапов (по строке JSON на этап)')
+    common.add_argument('--profile-stage', help='этап, для которого снимается профиль cProfile')
+    common.add_argument('--tracemalloc-stage', help='этап, для которого замеряется выделение памяти')
+
+    parser = argparse.ArgumentParser(description='Анализы покупок сотрудников')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    kategorii = subparsers.add_parser('kategorii', parents=[common], help='распределение категорий покупок')
+    kategorii.add_argument('--chunksize', type=int, help='читать покупки порциями такого размера')
+    kategorii.add_argument('--sweep', action='store_true', help='распределение категорий для квантилей порога 0.05-0.95')
+    kategorii.set_defaults(handler=run_kategorii)
+
+    magaziny = subparsers.add_parser('magaziny', parents=[common], help='популярность магазинов')
+    magaziny.add_argument('--test', choices=['mannwhitney', 'poisson'], help='проверка значимости по категориям')
+    magaziny.set_defaults(handler=run_magaziny)
+
+    ustoichivost = subparsers.add_parser('ustoichivost', parents=[common], help='сравнение групп сотрудников')
+    ustoichivost.add_argument('--permutations', type=int, default=0, help='число перестановок (0 - не проводить)')
+    ustoichivost.set_defaults(handler=run_ustoichivost)
+
+    strata = subparsers.add_parser('strata', parents=[common], help='сравнение групп по стратам')
+    strata.add_argument('--by', nargs='+', default=['Пол'], help='столбцы страт')
+    strata.add_argument('--jobs', type=int, default=None, help='число процессов')
+    strata.set_defaults(handler=run_strata)
+
+    kub = subparsers.add_parser('kub', parents=[common], help='показатели по оргструктуре')
+    kub.add_argument('path', nargs='*', help='департамент, подразделение (пусто - вся компания)')
+    kub.set_defaults(handler=run_kub)
+
+    korrelyacii = subparsers.add_parser('korrelyacii', parents=[common], help='матрица корреляций')
+    korrelyacii.add_argument('--method', choices=['pearson', 'spearman'], default='pearson')
+    korrelyacii.set_defaults(handler=run_korrelyacii)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    zamery = lazy_import('zamery')
+    zamery.setup_logging(args.log_level)
+    if args.metrics or args.profile_stage or args.tracemalloc_stage:
+        zamery.configure_metrics(args.metrics, args.profile_stage, args.tracemalloc_stage)
+    if args.plot_dir is not None and not args.no_plot:
+        lazy_import('grafiki').configure_rendering(args.plot_dir, args.plot_profile)
+
+    try:
+        # Обработчики возвращают графики списком задач: в пакетном режиме они строятся параллельно
+        figures = args.handler(args)
+        if figures:
+            lazy_import('grafiki').render_figures(figures, args.plot_jobs)
+    except FileNotFoundError as e:
+        # analyze_purchases передает сообщение без filename
+        print(f"Ошибка: Не удалось найти файл: {e.filename}" if e.filename else f"Ошибка: {e}")
+        return 1
+    except KeyError as e:
+        print(f"Ошибка: Отсутствует столбец: {e}")
+        return 1
+    finally:
+        if args.import_time:
+            print_import_report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
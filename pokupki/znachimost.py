@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+import rangi
+
+# Уровень значимости после поправки Бенджамини-Хохберга
+FDR_ALPHA = 0.05
+
+# Тесты, которые умеет test_categories
+CATEGORY_TESTS = ('mannwhitney', 'poisson')
+
+
+def benjamini_hochberg(p_values):
+    """Поправка Бенджамини-Хохберга: скорректированные p-value в исходном порядке"""
+    p_values = np.asarray(p_values, dtype=float)
+    n = len(p_values)
+    if n == 0:
+        return p_values
+    order = np.argsort(p_values)
+    ranked = p_values[order] * n / np.arange(1, n + 1)
+    # Накопленный минимум с конца делает скорректированные p-value монотонными
+    adjusted = np.minimum.accumulate(ranked[::-1])[::-1]
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def mannwhitney_columns(matrix, effective):
+    """
+    Тест Манна-Уитни (двусторонний, нормальное приближение с поправкой на связи
+    и на непрерывность, как scipy.stats.mannwhitneyu(method='asymptotic'))
+    сразу для всех столбцов разреженной матрицы счетчиков.
+    Ранги считаются не по сотрудникам, а по гистограммам значений каждого столбца
+    (rangi.mannwhitney_histograms): нули (их большинство) - один блок связанных рангов,
+    ненулевые значения заменяются их номером среди различных значений матрицы,
+    так что ширина гистограмм не зависит от величины счетчиков.
+    Возвращает статистику U эффективных и p-value для каждого столбца.
+    """
+    n_columns = matrix.shape[1]
+    n1 = effective.sum()
+    n2 = len(effective) - n1
+
+    entries = matrix.tocoo()
+    column = entries.col.astype(np.int64)
+    in_effective = effective[entries.row]
+    # Номер значения среди различных ненулевых значений (0 - ноль): порядок значений сохраняется
+    values, value_index = np.unique(entries.data, return_inverse=True)
+    value_index = value_index.ravel() + 1
+    width = len(values) + 1
+
+    histograms = np.zeros((n_columns, 2, width))
+    for group, rows in enumerate((in_effective, ~in_effective)):
+        histograms[:, group] = np.bincount(column[rows] * width + value_index[rows],
+                                           minlength=n_columns * width).reshape(n_columns, width)
+    # Число нулей в каждом столбце по группам
+    histograms[:, 0, 0] = n1 - histograms[:, 0].sum(axis=-1)
+    histograms[:, 1, 0] = n2 - histograms[:, 1].sum(axis=-1)
+
+    u1, p_values = rangi.mannwhitney_histograms(histograms[:, 0], histograms[:, 1])
+    # Столбец, где все значения одинаковы, различий не показывает
+    p_values[np.count_nonzero(histograms.sum(axis=1), axis=-1) <= 1] = 1.0
+    return u1, p_values
+
+
+def poisson_columns(matrix, effective):
+    """
+    Сравнение частоты покупок (пуассоновская модель) сразу для всех столбцов:
+    при общем числе покупок k число покупок эффективных имеет биномиальное распределение
+    с долей эффективных среди сотрудников. Двусторонний p-value - удвоенный меньший хвост.
+    Возвращает отношение частот (эффективные / неэффективные) и p-value.
+    """
+    n1 = effective.sum()
+    n2 = len(effective) - n1
+    k1 = np.asarray(matrix[np.flatnonzero(effective)].sum(axis=0)).ravel()
+    k2 = np.asarray(matrix[np.flatnonzero(~effective)].sum(axis=0)).ravel()
+    k = k1 + k2
+    share = n1 / (n1 + n2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate_ratio = (k1 / n1) / (k2 / n2)
+    tails = np.minimum(stats.binom.cdf(k1, k, share), stats.binom.sf(k1 - 1, k, share))
+    p_values = np.minimum(2 * tails, 1.0)
+    return rate_ratio, p_values
+
+
+def test_categories(matrix, categories, effective, method='mannwhitney', alpha=FDR_ALPHA):
+    """
+    Проверяет для каждой категории, различается ли число покупок на сотрудника
+    у эффективных и неэффективных сотрудников. Все категории считаются одним
+    векторным расчетом, p-value корректируются поправкой Бенджамини-Хохберга.
+
+    matrix - матрица покупок сотрудники x категории (build_purchase_matrix),
+    effective - значение 'Эффективность' для каждой строки матрицы (пропуски не учитываются).
+    Возвращает таблицу, отсортированную по p-value.
+    """
+    if method not in CATEGORY_TESTS:
+        raise ValueError(f"Неизвестный тест: {method}")
+
+    effective = pd.Series(np.asarray(effective, dtype=object))
+    known = effective.notna().to_numpy()
+    matrix = matrix[np.flatnonzero(known)]
+    effective = (effective[known] == True).to_numpy()
+
+    # Категории без покупок в обеих группах не проверяются
+    purchased = np.asarray(matrix.sum(axis=0)).ravel() > 0
+    matrix = matrix[:, np.flatnonzero(purchased)]
+    categories = pd.Index(categories)[purchased]
+
+    if method == 'mannwhitney':
+        statistic, p_values = mannwhitney_columns(matrix, effective)
+        statistic_name = 'U Манна-Уитни'
+    else:
+        statistic, p_values = poisson_columns(matrix, effective)
+        statistic_name = 'Отношение частот'
+
+    adjusted = benjamini_hochberg(p_values)
+    results = pd.DataFrame({
+        statistic_name: statistic,
+        'p-value': p_values,
+        'p-value (БХ)': adjusted,
+        'Значимо': adjusted <= alpha,
+    }, index=categories)
+    return results.sort_values(['p-value (БХ)', 'p-value'], kind='stable')